@@ -0,0 +1,25 @@
+# app/cache_utils.py
+import hashlib
+import os
+
+import pandas as pd
+
+# On-disk cache for trained models and precomputed artefacts, relative to the
+# working directory like the "data/..." paths used by the pages.
+CACHE_DIR = os.environ.get("AGRI_CACHE_DIR", ".cache")
+
+
+def cache_path(name):
+    """Return the path of a cache file, creating the cache directory if needed."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+def frame_fingerprint(df, *extra):
+    """Short, stable hash of a DataFrame's contents plus any extra parameters."""
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    digest.update(",".join(map(str, df.columns)).encode())
+    for value in extra:
+        digest.update(repr(value).encode())
+    return digest.hexdigest()[:16]
@@ -0,0 +1,43 @@
+# app/climate_data.py
+import pandas as pd
+
+from districts import with_district_ids
+from shared_data import shared_frame
+
+CLIMATE_DATA_PATH = "data/processed_temp_precipitation.csv"
+
+
+# Load and clean data
+def load_and_clean_data(file_path):
+    df = pd.read_csv(file_path)
+    
+    # Remove any rows with missing critical values
+    df = df.dropna(subset=['date', 't2m', 'prectot', 'district', 'year', 'month'])
+    df = with_district_ids(df, 'district')
+    
+    # Convert data types
+    df['date'] = pd.to_datetime(df['date'])
+    df['year'] = df['year'].astype(int)
+    df['month'] = df['month'].astype(int)
+    df['t2m'] = df['t2m'].astype(float)
+    df['prectot'] = df['prectot'].astype(float)
+    
+    # Add season column
+    def get_season(month):
+        if month in [12, 1, 2]:
+            return 'Winter'
+        elif month in [3, 4, 5]:
+            return 'Spring'
+        elif month in [6, 7, 8]:
+            return 'Monsoon'
+        else:
+            return 'Autumn'
+    
+    df['season'] = df['month'].apply(get_season)
+    
+    return df
+
+
+def load_climate_data(file_path):
+    """Cleaned climate table as a shared read-only view; see shared_data."""
+    return shared_frame("climate", [file_path], lambda: load_and_clean_data(file_path), version=2)
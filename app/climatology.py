@@ -0,0 +1,98 @@
+# app/climatology.py
+"""District x calendar-month climatology and standardized anomalies.
+
+The monthly climate table is scattered once into dense arrays of shape
+(N_DISTRICTS, n_years, 12) indexed by district ID, and the baseline mean and
+standard deviation over BASELINE_YEARS are computed from them. Both are kept
+for the life of the process, so anomalies for any period are a slice of the
+cube minus the baseline broadcast over the year axis, with no per-query
+groupby.
+"""
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from climate_data import CLIMATE_DATA_PATH, load_climate_data
+from districts import DISTRICTS, N_DISTRICTS
+from shared_data import source_fingerprint
+
+BASELINE_YEARS = (1981, 2010)
+VARIABLES = ('t2m', 'prectot')
+
+
+class Climatology:
+    """Monthly values and their baseline statistics, as arrays indexed by district ID."""
+
+    def __init__(self, years, values, mean, std, baseline=BASELINE_YEARS):
+        self.years = years
+        self.values = values
+        self.mean = mean
+        self.std = std
+        self.baseline = baseline
+        # Districts without any data stay NaN throughout and are left out of series
+        self.district_ids = np.flatnonzero(~np.isnan(next(iter(values.values()))).all(axis=(1, 2)))
+        self.district_names = [DISTRICTS[i] for i in self.district_ids]
+
+    def _year_slice(self, start, end):
+        start = self.years[0] if start is None else start
+        end = self.years[-1] if end is None else end
+        return slice(np.searchsorted(self.years, start), np.searchsorted(self.years, end, side='right'))
+
+    def anomalies(self, variable, start=None, end=None, standardized=True):
+        """(N_DISTRICTS, n_years, 12) anomalies for the years ``start``..``end``."""
+        anomaly = self.values[variable][:, self._year_slice(start, end)] - self.mean[variable][:, None, :]
+        if standardized:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                anomaly = anomaly / self.std[variable][:, None, :]
+        return anomaly
+
+    def anomaly_map(self, variable, start=None, end=None, standardized=True):
+        """Mean anomaly of each district over the period, indexed by district ID."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN districts
+            return np.nanmean(self.anomalies(variable, start, end, standardized), axis=(1, 2))
+
+    def anomaly_series(self, variable, start=None, end=None, standardized=True):
+        """Month-end dates and an (n_districts, n_months) matrix, rows in ``district_names`` order."""
+        years = self.years[self._year_slice(start, end)]
+        matrix = self.anomalies(variable, start, end, standardized)[self.district_ids]
+        dates = pd.date_range(f"{years[0]}-01-01", periods=len(years) * 12, freq="ME")
+        return dates, matrix.reshape(len(self.district_ids), -1)
+
+
+def build_climatology(df, baseline=BASELINE_YEARS, variables=VARIABLES):
+    """Scatter the monthly table into per-district cubes and compute the baseline."""
+    years = np.arange(df['year'].min(), df['year'].max() + 1)
+    ids = df['district_id'].to_numpy()
+    year_index = df['year'].to_numpy() - years[0]
+    month_index = df['month'].to_numpy() - 1
+    base = slice(np.searchsorted(years, baseline[0]), np.searchsorted(years, baseline[1], side='right'))
+
+    values, mean, std = {}, {}, {}
+    for variable in variables:
+        cube = np.full((N_DISTRICTS, len(years), 12), np.nan)
+        cube[ids, year_index, month_index] = df[variable].to_numpy()
+        values[variable] = cube
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # districts with no baseline data stay NaN
+            mean[variable] = np.nanmean(cube[:, base], axis=1)
+            std[variable] = np.nanstd(cube[:, base], axis=1, ddof=1)
+    return Climatology(years, values, mean, std, baseline)
+
+
+_climatologies = {}
+_lock = threading.Lock()
+
+
+def get_climatology(path=CLIMATE_DATA_PATH, baseline=BASELINE_YEARS):
+    """Process-wide Climatology of the climate table at ``path``, rebuilt when the file changes."""
+    key = source_fingerprint([path], baseline)
+    with _lock:
+        climatology = _climatologies.get(key)
+        if climatology is None:
+            climatology = build_climatology(load_climate_data(path), baseline)
+            _climatologies.clear()
+            _climatologies[key] = climatology
+    return climatology
@@ -0,0 +1,164 @@
+# app/districts.py
+"""Canonical district registry.
+
+Every dataset spells district names its own way ("Chitawan", "CHITWAN",
+"Kabhre", "Kavrepalanchok", ...). Loaders resolve them here to one canonical
+name and a dense integer ID (the name's position in ``DISTRICTS``), so joins
+between datasets compare integers and per-district metrics can be held in
+arrays of length ``N_DISTRICTS`` indexed by ID.
+"""
+import re
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from shared_data import shared_frame
+
+COORDINATES_PATH = "data/district_coordinates.csv"
+SHAPES_PATH = "data/nepal-districts.geojson"
+
+# The 75 districts of the pre-2015 administrative map used by the GeoJSON and
+# the agriculture census
+DISTRICTS = (
+    'Achham', 'Arghakhanchi', 'Baglung', 'Baitadi', 'Bajhang', 'Bajura', 'Banke', 'Bara',
+    'Bardiya', 'Bhaktapur', 'Bhojpur', 'Chitwan', 'Dadeldhura', 'Dailekh', 'Dang', 'Darchula',
+    'Dhading', 'Dhankuta', 'Dhanusa', 'Dolakha', 'Dolpa', 'Doti', 'Gorkha', 'Gulmi', 'Humla',
+    'Ilam', 'Jajarkot', 'Jhapa', 'Jumla', 'Kailali', 'Kalikot', 'Kanchanpur', 'Kapilbastu',
+    'Kaski', 'Kathmandu', 'Kavrepalanchok', 'Khotang', 'Lalitpur', 'Lamjung', 'Mahottari',
+    'Makwanpur', 'Manang', 'Morang', 'Mugu', 'Mustang', 'Myagdi', 'Nawalparasi', 'Nuwakot',
+    'Okhaldhunga', 'Palpa', 'Panchthar', 'Parbat', 'Parsa', 'Pyuthan', 'Ramechhap', 'Rasuwa',
+    'Rautahat', 'Rolpa', 'Rukum', 'Rupandehi', 'Salyan', 'Sankhuwasabha', 'Saptari', 'Sarlahi',
+    'Sindhuli', 'Sindhupalchok', 'Siraha', 'Solukhumbu', 'Sunsari', 'Surkhet', 'Syangja',
+    'Tanahun', 'Taplejung', 'Terhathum', 'Udayapur',
+)
+N_DISTRICTS = len(DISTRICTS)
+
+# Alternative spellings found in the data files and in common use. Districts
+# split in 2015 map back to their parent district.
+ALIASES = {
+    'Bajang': 'Bajhang',
+    'Chitawan': 'Chitwan',
+    'Dhanusha': 'Dhanusa',
+    'Dolkha': 'Dolakha',
+    'Kabhre': 'Kavrepalanchok',
+    'Kavre': 'Kavrepalanchok',
+    'Kabhrepalanchok': 'Kavrepalanchok',
+    'Kapilvastu': 'Kapilbastu',
+    'Makawanpur': 'Makwanpur',
+    'Nawalparasi East': 'Nawalparasi',
+    'Nawalparasi West': 'Nawalparasi',
+    'Nawalpur': 'Nawalparasi',
+    'Parasi': 'Nawalparasi',
+    'Panchther': 'Panchthar',
+    'Routahat': 'Rautahat',
+    'Rukum East': 'Rukum',
+    'Rukum West': 'Rukum',
+    'Sindhupalchowk': 'Sindhupalchok',
+    'Tanahu': 'Tanahun',
+    'Tehrathum': 'Terhathum',
+}
+
+_NAMES = np.array(DISTRICTS, dtype=object)
+
+
+def _normalize(name):
+    return re.sub(r'[^a-z]', '', str(name).lower())
+
+
+_LOOKUP = {_normalize(name): i for i, name in enumerate(DISTRICTS)}
+_LOOKUP.update({_normalize(alias): DISTRICTS.index(name) for alias, name in ALIASES.items()})
+
+
+def district_ids(names, errors='raise'):
+    """Integer IDs for an array of district names, resolved through the aliases.
+
+    Missing names get -1. Unrecognised names raise a KeyError, or also get -1
+    with ``errors='coerce'``.
+    """
+    codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+    resolved = np.array([_LOOKUP.get(_normalize(name), -1) for name in uniques], dtype=np.int16)
+    unknown = [name for name, i in zip(uniques, resolved) if i < 0]
+    if unknown and errors == 'raise':
+        raise KeyError(f"Unknown districts: {', '.join(map(str, unknown))}")
+    return np.append(resolved, np.int16(-1))[codes]
+
+
+def district_id(name):
+    """Integer ID of a single district name."""
+    return int(district_ids([name])[0])
+
+
+def district_names(ids):
+    """Canonical names for an array of IDs (None for -1)."""
+    ids = np.asarray(ids)
+    return np.where(ids >= 0, _NAMES[np.clip(ids, 0, None)], None)
+
+
+def with_district_ids(df, column, errors='raise'):
+    """``df`` with ``column`` replaced by canonical names and a ``district_id`` column added."""
+    ids = district_ids(df[column], errors=errors)
+    return df.assign(**{column: district_names(ids), 'district_id': ids})
+
+
+def per_district(ids, values=None, how='sum'):
+    """Aggregate ``values`` by district into an array indexed by ID.
+
+    ``how`` is 'count', 'sum' or 'mean'; districts without rows get 0 for
+    counts and sums and NaN for means. Rows with ID -1 are ignored.
+    """
+    ids = np.asarray(ids)
+    valid = ids >= 0
+    counts = np.bincount(ids[valid], minlength=N_DISTRICTS).astype(np.float64)
+    if how == 'count':
+        return counts
+    sums = np.bincount(ids[valid], weights=np.asarray(values, dtype=np.float64)[valid], minlength=N_DISTRICTS)
+    if how == 'sum':
+        return sums
+    if how == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+    raise ValueError(f"Unknown aggregation {how!r}")
+
+
+def district_crosstab(ids, codes, n_codes):
+    """(N_DISTRICTS, n_codes) matrix counting rows per district and category code."""
+    ids, codes = np.asarray(ids), np.asarray(codes)
+    valid = (ids >= 0) & (codes >= 0)
+    flat = np.bincount(ids[valid].astype(np.int64) * n_codes + codes[valid], minlength=N_DISTRICTS * n_codes)
+    return flat.reshape(N_DISTRICTS, n_codes)
+
+
+def load_district_coordinates(path=COORDINATES_PATH):
+    """(N_DISTRICTS, 2) array of latitude/longitude by ID; NaN where unknown.
+
+    Districts listed under several names (split districts) get the mean position.
+    """
+    df = pd.read_csv(path)
+    ids = district_ids(df['district'])
+    return np.column_stack([per_district(ids, df['latitude'], how='mean'),
+                            per_district(ids, df['longitude'], how='mean')])
+
+
+def load_district_shapes(path=SHAPES_PATH):
+    """District polygons with canonical names and IDs, shared by every session."""
+    def build():
+        shapes = gpd.read_file(path)[['DISTRICT', 'geometry']].rename(columns={'DISTRICT': 'district'})
+        return with_district_ids(shapes, 'district')
+    return shared_frame("district_shapes", [path], build, persist=False)
+
+
+_geojson = {}
+
+
+def district_geojson(tolerance=0.01, path=SHAPES_PATH):
+    """Simplified district outlines as GeoJSON with the district ID as feature id.
+
+    Built once per tolerance; small enough to send with every map that only
+    needs district outlines.
+    """
+    if tolerance not in _geojson:
+        shapes = load_district_shapes(path)
+        simplified = shapes.geometry.simplify(tolerance, preserve_topology=True)
+        _geojson[tolerance] = gpd.GeoSeries(simplified.values, index=shapes['district_id'].values).__geo_interface__
+    return _geojson[tolerance]
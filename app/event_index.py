@@ -0,0 +1,103 @@
+# app/event_index.py
+"""Year-sorted event catalogue with per-type posting lists.
+
+Year ranges resolve to a contiguous block of rows by binary search, and each
+disaster type keeps the (year-ordered) row positions of its events, so a
+query costs O(types x log n) plus the size of its result instead of a scan
+of the whole catalogue. Queries return an EventView that the charts of one
+rerun share; columns are sliced from the catalogue only when first read.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from districts import per_district
+
+
+class EventView:
+    """The rows of an EventIndex matched by one query."""
+
+    def __init__(self, index, rows):
+        self.index = index
+        self.rows = rows  # a slice for plain year ranges, else sorted row positions
+
+    def __len__(self):
+        if isinstance(self.rows, slice):
+            return self.rows.stop - self.rows.start
+        return len(self.rows)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def column(self, name):
+        """One column of the matched rows as a NumPy array (a view for year ranges)."""
+        return self.index.columns[name][self.rows]
+
+    @cached_property
+    def frame(self):
+        """The matched rows as a DataFrame; built once per view."""
+        return self.index.events.iloc[self.rows]
+
+    @cached_property
+    def type_counts(self):
+        """Events per disaster type, as a Series indexed by type name."""
+        counts = np.bincount(self.column('type_code'), minlength=len(self.index.types))
+        return pd.Series(counts, index=self.index.types)
+
+    @cached_property
+    def district_counts(self):
+        """Events per district, as an array indexed by district ID."""
+        return per_district(self.column('district_id'), how='count')
+
+
+class EventIndex:
+    def __init__(self, events):
+        years = events['year'].to_numpy()
+        if np.any(np.diff(years) < 0):
+            events = events.iloc[np.argsort(years, kind='stable')].reset_index(drop=True)
+            years = events['year'].to_numpy()
+        self.events = events
+        # Types in order of first appearance, as ``unique()`` lists them
+        codes, types = pd.factorize(events['disaster_type'], sort=False)
+        self.types = list(types)
+        self.columns = {name: events[name].to_numpy() for name in events.columns}
+        self.columns['type_code'] = codes
+        self.years = years
+
+        # Stable sort by type keeps each posting list in year order
+        by_type = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[by_type], np.arange(len(self.types) + 1))
+        self.postings = {t: by_type[bounds[i]:bounds[i + 1]] for i, t in enumerate(self.types)}
+
+    @property
+    def year_min(self):
+        return int(self.years[0])
+
+    @property
+    def year_max(self):
+        return int(self.years[-1])
+
+    def year_rows(self, year_range=None):
+        """Slice of the rows whose year lies in the inclusive ``year_range``."""
+        if not year_range:
+            return slice(0, len(self.years))
+        lo = int(np.searchsorted(self.years, year_range[0], side='left'))
+        hi = int(np.searchsorted(self.years, year_range[1], side='right'))
+        return slice(lo, max(lo, hi))
+
+    def query(self, year_range=None, disaster_types=None):
+        """Events in ``year_range`` of any of ``disaster_types`` (all types when empty)."""
+        rows = self.year_rows(year_range)
+        if not disaster_types:
+            return EventView(self, rows)
+        parts = []
+        for disaster_type in dict.fromkeys(disaster_types):
+            postings = self.postings.get(disaster_type)
+            if postings is None:
+                continue
+            a, b = np.searchsorted(postings, [rows.start, rows.stop])
+            parts.append(postings[a:b])
+        matched = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+        return EventView(self, matched)
@@ -0,0 +1,47 @@
+# app/events_data.py
+import numpy as np
+import pandas as pd
+
+from districts import district_names
+from geocoding import get_geocoder
+from shared_data import shared_frame
+
+EVENTS_PATH = "data/processed_extreme_weather_events.csv"
+
+# Records without a precise location carry the centroid of the country
+DEFAULT_COORDINATES = (28.348895238095242, 83.59854761904762)
+
+
+def load_events(path=EVENTS_PATH):
+    """Raw extreme weather event records as a shared read-only view; see shared_data."""
+    return shared_frame("extreme_weather_events", [path], lambda: pd.read_csv(path))
+
+
+def clean_events(df):
+    """Handle missing values and duplicates, and assign events to districts.
+
+    Records placed at the default country centroid are kept with level
+    'country' and district ID -1; all others get level 'district' and the
+    district with the nearest centroid.
+    """
+    # Drop exact duplicates
+    df = df.drop_duplicates(subset=['disno'])
+
+    # Rows with default coordinates are only known at country level
+    country_level = (np.isclose(df['latitude'], DEFAULT_COORDINATES[0], rtol=0, atol=1e-6) &
+                     np.isclose(df['longitude'], DEFAULT_COORDINATES[1], rtol=0, atol=1e-6))
+    ids, distances = get_geocoder().nearest(df['latitude'], df['longitude'])
+    ids[country_level] = -1
+    distances[country_level] = np.nan
+
+    # Convert date column
+    start_date = pd.to_datetime(df['start_date'])
+    return df.assign(
+        start_date=start_date,
+        year=start_date.dt.year,
+        month=start_date.dt.month,
+        level=np.where(country_level, 'country', 'district'),
+        district=district_names(ids),
+        district_id=ids,
+        district_distance_km=distances
+    )
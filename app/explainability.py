@@ -0,0 +1,104 @@
+# app/explainability.py
+"""Feature importance for the tree-based crop yield models.
+
+Two views per model: the native importances of the fitted trees (impurity
+decrease for the Random Forest, gain for XGBoost) and grouped permutation
+importance, the drop in test R² when a feature is shuffled. The one-hot
+district columns are shuffled together as a single "District" feature, which
+keeps every permuted row a valid one-hot vector and costs one model
+evaluation instead of one per district. Permutation repeats run in parallel
+worker processes, and results are cached on disk next to the key of the
+training run they explain.
+"""
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import r2_score
+
+from cache_utils import cache_path
+from jobs import process_pool, report_progress
+
+EXPLAINED_MODELS = ("Random Forest", "XGBoost")
+DISTRICT_PREFIX = "DISTRICT_NAME_"
+N_REPEATS = 10
+
+_models = None
+_X = None
+_y = None
+_groups = None
+
+
+def feature_groups(columns):
+    """Map each model feature to the column positions it spans; district dummies form one group."""
+    groups = {}
+    for i, column in enumerate(columns):
+        name = "District" if column.startswith(DISTRICT_PREFIX) else column
+        groups.setdefault(name, []).append(i)
+    return groups
+
+
+def native_importance(model, groups):
+    """The model's own feature importances, summed over each group."""
+    importances = np.asarray(model.feature_importances_, dtype=np.float64)
+    return np.array([importances[idx].sum() for idx in groups.values()])
+
+
+def _init_worker(models, X, y, groups):
+    global _models, _X, _y, _groups
+    _models, _X, _y, _groups = models, X, y, groups
+
+
+def _permutation_repeat(seed):
+    """One repeat: R² drop of every model when each group's columns are shuffled together."""
+    rng = np.random.default_rng(seed)
+    drops = {}
+    for name, model in _models.items():
+        baseline = r2_score(_y, model.predict(_X))
+        model_drops = []
+        for idx in _groups.values():
+            permuted = _X.copy()
+            permuted.iloc[:, idx] = _X.iloc[rng.permutation(len(_X)), idx].to_numpy()
+            model_drops.append(baseline - r2_score(_y, model.predict(permuted)))
+        drops[name] = model_drops
+    return drops
+
+
+def explain_models(results, X_test, y_test, key, n_repeats=N_REPEATS, workers=None):
+    """Native and grouped permutation importance for the tree models in ``results``.
+
+    ``results`` is the dictionary returned by ``train_models`` and ``key``
+    identifies that training run. Returns {model name: DataFrame with columns
+    feature, native, permutation and permutation_std}, most important first.
+    """
+    path = cache_path(f"explain-{key}-{n_repeats}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path)
+
+    models = {name: results[name]["model"] for name in EXPLAINED_MODELS if name in results}
+    groups = feature_groups(X_test.columns)
+    repeats = {name: [] for name in models}
+    report_progress(0.0, f"Permuting {len(groups)} feature groups")
+    # Copies: views of the read-only shared frames arrive read-only in the workers
+    executor = process_pool(max_workers=workers, initializer=_init_worker,
+                            initargs=(models, X_test.copy(), y_test.to_numpy(copy=True), groups))
+    try:
+        for i, drops in enumerate(executor.map(_permutation_repeat, range(n_repeats))):
+            for name, model_drops in drops.items():
+                repeats[name].append(model_drops)
+            report_progress((i + 1) / n_repeats, f"Finished {i + 1} of {n_repeats} permutation repeats")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    explanations = {}
+    for name, model in models.items():
+        drops = np.asarray(repeats[name])
+        explanations[name] = pd.DataFrame({
+            "feature": list(groups),
+            "native": native_importance(model, groups),
+            "permutation": drops.mean(axis=0),
+            "permutation_std": drops.std(axis=0)
+        }).sort_values("permutation", ascending=False, ignore_index=True)
+    joblib.dump(explanations, path)
+    return explanations
@@ -0,0 +1,221 @@
+# app/figure_codec.py
+"""Compact serialization of Plotly figures.
+
+Floating-point arrays are rounded to ``PRECISION`` significant digits and
+map coordinates (lat/lon arrays and GeoJSON) to ``COORDINATE_DECIMALS``
+decimal places before a figure leaves the server, which shortens every
+number written as JSON text. Standalone HTML exports go further: numeric
+arrays are written as base64 typed arrays (decoded natively by plotly.js
+2.28+) and string arrays with repeated values, such as hover fields, are
+dictionary-encoded (dates as day numbers) and expanded in the browser by
+``DECODER_JS``.
+"""
+import base64
+import datetime
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+PRECISION = int(os.environ.get("AGRI_FIGURE_PRECISION", 6))
+# Fixed decimal places for longitude/latitude: 5 is about 1 m, whatever the value precision
+COORDINATE_DECIMALS = int(os.environ.get("AGRI_FIGURE_COORDINATE_DECIMALS", 5))
+_COORDINATE_KEYS = ("lat", "lon")
+
+# Standalone reports need a plotly.js release that understands typed-array specs
+PLOTLY_JS_URL = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+
+_INT_TYPES = ["u1", "i1", "u2", "i2", "u4", "i4"]
+
+
+def round_significant(values, precision=PRECISION):
+    """Round a float array to ``precision`` significant digits."""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values) & (values != 0)
+    magnitude = np.zeros_like(values)
+    magnitude[finite] = np.floor(np.log10(np.abs(values[finite])))
+    scale = 10.0 ** (precision - 1 - magnitude)
+    return np.where(finite, np.round(values * scale) / scale, values)
+
+
+def _round_coordinates(coords, decimals):
+    if isinstance(coords, (list, tuple)):
+        # A position or a whole ring of positions is rounded in one call
+        if coords and (isinstance(coords[0], (int, float))
+                       or (isinstance(coords[0], (list, tuple)) and isinstance(coords[0][0], (int, float)))):
+            return np.round(np.asarray(coords, dtype=np.float64), decimals).tolist()
+        return [_round_coordinates(c, decimals) for c in coords]
+    if isinstance(coords, dict):
+        return {k: _round_coordinates(v, decimals) if k in ("coordinates", "geometry", "features", "geometries")
+                else v for k, v in coords.items()}
+    return coords
+
+
+def _as_array(value):
+    """Numeric or string ndarray for array-like trace attributes, otherwise None."""
+    if isinstance(value, (list, tuple)) and value and not isinstance(value[0], (dict, list, tuple)):
+        value = np.asarray(value)
+    if isinstance(value, np.ndarray) and value.dtype.kind in "fiuMUO":
+        return value
+    return None
+
+
+def _walk(obj, visit):
+    """Apply ``visit(key, value)`` to every attribute of a nested figure dict."""
+    if isinstance(obj, dict):
+        return {key: visit(key, value, lambda v: _walk(v, visit)) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)) and obj and isinstance(obj[0], dict):
+        return [_walk(item, visit) for item in obj]
+    return obj
+
+
+def _rounded(key, value, recurse, precision, decimals):
+    if key == "geojson":
+        return _round_coordinates(value, decimals)
+    array = _as_array(value)
+    if array is not None and array.dtype.kind == "f":
+        if key in _COORDINATE_KEYS:
+            return np.round(array, decimals)
+        return round_significant(array, precision)
+    return recurse(value)
+
+
+def _figure_parts(fig_dict, data_visit, layout_visit):
+    """Data, layout and animation frames of a figure dict, with traces and layouts walked."""
+    parts = {
+        "data": [_walk(trace, data_visit) for trace in fig_dict.get("data", [])],
+        "layout": _walk(fig_dict.get("layout", {}), layout_visit),
+    }
+    if fig_dict.get("frames"):
+        # Frame names and trace indices are kept as they are
+        parts["frames"] = [{**frame,
+                            "data": [_walk(trace, data_visit) for trace in frame.get("data", [])],
+                            "layout": _walk(frame.get("layout", {}), layout_visit)}
+                           for frame in fig_dict["frames"]]
+    return parts
+
+
+def round_figure(fig, precision=PRECISION, coordinate_decimals=COORDINATE_DECIMALS):
+    """Copy of ``fig`` as a plain dict with all float data rounded."""
+    fig_dict = fig.to_plotly_json() if isinstance(fig, go.Figure) else fig
+    visit = partial(_rounded, precision=precision, decimals=coordinate_decimals)
+    return _figure_parts(fig_dict, visit, visit)
+
+
+def plotly_chart(fig, precision=PRECISION, coordinate_decimals=COORDINATE_DECIMALS, **kwargs):
+    """``st.plotly_chart`` with the figure's numbers rounded first.
+
+    Streamlit's bundled plotly.js predates typed-array support, so only the
+    rounding applies here.
+    """
+    return st.plotly_chart(round_figure(fig, precision, coordinate_decimals), **kwargs)
+
+
+def _typed_array(array, precision):
+    """plotly.js typed-array spec ({dtype, bdata[, shape]}) for a numeric array."""
+    if array.dtype.kind == "f":
+        dtype = "f4" if precision <= 7 else "f8"
+    else:
+        dtype = next((t for t in _INT_TYPES
+                      if array.size == 0 or (np.iinfo(t).min <= array.min() and array.max() <= np.iinfo(t).max)),
+                     "f8")
+    spec = {"dtype": dtype, "bdata": base64.b64encode(np.ascontiguousarray(array, dtype=dtype).tobytes()).decode()}
+    if array.ndim > 1:
+        spec["shape"] = ",".join(map(str, array.shape))
+    return spec
+
+
+def _date_column(values):
+    """Calendar dates as day numbers, or None when the values are not all midnight dates."""
+    try:
+        dates = pd.to_datetime(values)
+    except (TypeError, ValueError):
+        return None
+    if dates.tz is not None or dates.isna().any() or (dates != dates.normalize()).any():
+        return None
+    days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+    return {"_days": _typed_array(days, 0)}
+
+
+def _string_column(values):
+    """Dictionary-encode a column of strings when values repeat, else leave it as a list."""
+    if not all(isinstance(v, str) for v in values):
+        if len(values) and all(isinstance(v, (datetime.date, np.datetime64)) for v in values):
+            return _date_column(values) or values.tolist()
+        return values.tolist()
+    categories, codes = np.unique(values, return_inverse=True)
+    if len(categories) > len(values) / 2:
+        return values.tolist()
+    return {"_categories": categories.tolist(), "_codes": _typed_array(codes, 0)}
+
+
+def _encoded(key, value, recurse, precision, decimals):
+    if key == "geojson":
+        return _round_coordinates(value, decimals)
+    array = _as_array(value)
+    if array is None:
+        return recurse(value)
+    if array.dtype.kind == "f":
+        if key in _COORDINATE_KEYS:
+            # float32 keeps only ~7 significant digits, too few for 5 decimals of longitude
+            return _typed_array(np.round(array, decimals), 8)
+        return _typed_array(round_significant(array, precision), precision)
+    if array.dtype.kind in "iu":
+        return _typed_array(array, precision)
+    if array.dtype.kind == "M":
+        return _date_column(array) or recurse(value)
+    if array.ndim == 2:
+        # Hover data: one dictionary per column, zipped back into rows by the decoder
+        return {"_columns": [_encoded(key, array[:, j], recurse, precision, decimals)
+                             for j in range(array.shape[1])]}
+    return _string_column(array)
+
+
+def figure_to_compact_json(fig, precision=PRECISION, coordinate_decimals=COORDINATE_DECIMALS):
+    """JSON for ``Plotly.newPlot`` with typed arrays and dictionary-encoded strings.
+
+    Pass the parsed object through ``decodeFigure`` (``DECODER_JS``) first.
+    """
+    fig_dict = fig.to_plotly_json() if isinstance(fig, go.Figure) else fig
+    compact = _figure_parts(fig_dict,
+                            partial(_encoded, precision=precision, decimals=coordinate_decimals),
+                            partial(_rounded, precision=precision, decimals=coordinate_decimals))
+    return pio.to_json(compact, validate=False, remove_uids=False)
+
+
+# Expands dictionary-encoded strings and column-split hover data in place;
+# plain typed arrays are left for plotly.js to decode.
+DECODER_JS = """
+function decodeTypedArray(spec) {
+    var types = {u1: Uint8Array, i1: Int8Array, u2: Uint16Array, i2: Int16Array,
+                 u4: Uint32Array, i4: Int32Array, f4: Float32Array, f8: Float64Array};
+    var bytes = Uint8Array.from(atob(spec.bdata), function (c) { return c.charCodeAt(0); });
+    return Array.from(new types[spec.dtype](bytes.buffer));
+}
+function decodeColumn(column) {
+    if (column && column._days) {
+        return decodeTypedArray(column._days).map(function (day) {
+            return new Date(day * 864e5).toISOString().slice(0, 10);
+        });
+    }
+    if (column && column._categories) {
+        return decodeTypedArray(column._codes).map(function (code) { return column._categories[code]; });
+    }
+    return column && column.bdata ? decodeTypedArray(column) : column;
+}
+function decodeFigure(obj) {
+    if (Array.isArray(obj)) { return obj.map(decodeFigure); }
+    if (!obj || typeof obj !== 'object' || obj.bdata) { return obj; }
+    if (obj._categories || obj._days) { return decodeColumn(obj); }
+    if (obj._columns) {
+        var columns = obj._columns.map(decodeColumn);
+        return columns[0].map(function (_, i) { return columns.map(function (c) { return c[i]; }); });
+    }
+    Object.keys(obj).forEach(function (key) { obj[key] = decodeFigure(obj[key]); });
+    return obj;
+}
+"""
@@ -0,0 +1,155 @@
+# app/forecasting.py
+"""Seasonal ETS (Holt-Winters) forecasts for every district x climate variable.
+
+Series are fitted in parallel worker processes. Each fit is cached with its
+parameters and the hash of the data it saw: unchanged series reuse the
+cached forecast, and series that gained new months are refitted starting
+from the previous parameters, which converges in a fraction of the
+iterations of a cold fit. Run from the repository root to warm the cache:
+
+    python app/forecasting.py --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import cache_path
+from districts import DISTRICTS, with_district_ids
+from jobs import process_pool, report_progress
+
+# Additive damped trend with additive yearly seasonality
+MODEL_SPEC = {"error": "add", "trend": "add", "damped_trend": True,
+              "seasonal": "add", "seasonal_periods": 12}
+
+# Precipitation is modelled on log1p scale so forecasts and intervals stay non-negative
+VARIABLES = {
+    "t2m": {"label": "Temperature (°C)", "transform": None},
+    "prectot": {"label": "Precipitation (mm)", "transform": "log1p"},
+}
+HORIZON = 24
+ALPHA = 0.05
+
+
+def _series_hash(values, last_date):
+    digest = hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    digest.update(str(last_date).encode())
+    return digest.hexdigest()[:16]
+
+
+def _cache_file(district, variable):
+    spec = hashlib.sha1(json.dumps(MODEL_SPEC, sort_keys=True).encode()).hexdigest()[:8]
+    slug = "".join(c if c.isalnum() else "_" for c in district)
+    directory = cache_path(os.path.join("forecasts", spec))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{slug}__{variable}.json")
+
+
+def _fit_series(values, transform, start_params, horizon, alpha):
+    """Fit one series (in a worker process) and forecast ``horizon`` months ahead."""
+    from statsmodels.tsa.exponential_smoothing.ets import ETSModel
+
+    y = pd.Series(np.log1p(values) if transform == "log1p" else values)
+    model = ETSModel(y, **MODEL_SPEC)
+    if start_params is not None and len(start_params) != len(model.param_names):
+        start_params = None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        result = model.fit(start_params=None if start_params is None else np.asarray(start_params), disp=False)
+    frame = result.get_prediction(start=len(y), end=len(y) + horizon - 1).summary_frame(alpha=alpha)
+    forecast = frame[["mean", "pi_lower", "pi_upper"]].to_numpy()
+    if transform == "log1p":
+        forecast = np.clip(np.expm1(forecast), 0, None)
+    return {
+        "params": result.params.tolist(),
+        "iterations": (result.mle_retvals or {}).get("iterations"),
+        "mean": forecast[:, 0].tolist(),
+        "lower": forecast[:, 1].tolist(),
+        "upper": forecast[:, 2].tolist(),
+    }
+
+
+def _load_entry(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def _to_frame(district, variable, last_date, entry):
+    dates = pd.date_range(last_date, periods=len(entry["mean"]) + 1, freq="ME")[1:]
+    return pd.DataFrame({
+        "district_id": DISTRICTS.index(district), "district": district, "variable": variable, "date": dates,
+        "mean": entry["mean"], "lower": entry["lower"], "upper": entry["upper"]
+    })
+
+
+def forecast_all(df, variables=tuple(VARIABLES), horizon=HORIZON, alpha=ALPHA, workers=None):
+    """Forecasts with prediction intervals for every district x variable in ``df``.
+
+    ``df`` is the cleaned monthly climate table (``date``, ``district_id`` and
+    one column per variable). Returns a long DataFrame with columns
+    district_id, district, variable, date, mean, lower and upper.
+    """
+    df = df.sort_values(["district_id", "date"])
+    series = []
+    for district_id, group in df.groupby("district_id", sort=True):
+        district = DISTRICTS[district_id]
+        last_date = group["date"].iloc[-1]
+        for variable in variables:
+            values = group[variable].to_numpy(dtype=np.float64)
+            series.append((district, variable, last_date, values))
+
+    frames = []
+    pending = {}
+    total = len(series)
+    with process_pool(max_workers=workers) as executor:
+        for district, variable, last_date, values in series:
+            path = _cache_file(district, variable)
+            data_hash = _series_hash(values, last_date)
+            cached = _load_entry(path)
+            if cached and cached["data_hash"] == data_hash and cached["horizon"] == horizon \
+                    and cached["alpha"] == alpha:
+                frames.append(_to_frame(district, variable, last_date, cached))
+                continue
+            # Warm start from the last fit of this series, if any
+            start_params = cached["params"] if cached else None
+            future = executor.submit(_fit_series, values, VARIABLES[variable]["transform"],
+                                     start_params, horizon, alpha)
+            pending[future] = (district, variable, last_date, path, data_hash)
+
+        report_progress(len(frames) / total, f"Fitting {len(pending)} of {total} series",
+                        partial=pd.concat(frames, ignore_index=True) if frames else None)
+        for future in as_completed(pending):
+            district, variable, last_date, path, data_hash = pending[future]
+            entry = {**future.result(), "data_hash": data_hash, "horizon": horizon,
+                     "alpha": alpha, "last_date": str(last_date)}
+            with open(path + ".tmp", "w") as f:
+                json.dump(entry, f)
+            os.replace(path + ".tmp", path)
+            frames.append(_to_frame(district, variable, last_date, entry))
+            report_progress(len(frames) / total, f"Fitted {len(frames)} of {total} series",
+                            partial=pd.concat(frames, ignore_index=True))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit and cache district climate forecasts.")
+    parser.add_argument("--data", default="data/processed_temp_precipitation.csv")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="months ahead")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, parse_dates=["date"]).dropna(subset=["date", "district", *VARIABLES])
+    data = with_district_ids(data, "district")
+    start = time.perf_counter()
+    forecasts = forecast_all(data, horizon=args.horizon, workers=args.workers)
+    print(f"{forecasts.groupby(['district', 'variable']).ngroups} series forecast "
+          f"in {time.perf_counter() - start:.1f}s")
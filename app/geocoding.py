@@ -0,0 +1,60 @@
+# app/geocoding.py
+"""Nearest-district geocoding of latitude/longitude points.
+
+A haversine BallTree over the district centroids in district_coordinates.csv
+is built once per process. Points are assigned to the district with the
+nearest centroid in batches of BATCH_SIZE, which bounds the memory used by
+the tree queries and lets one index serve arbitrarily large point sets.
+"""
+import threading
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from districts import COORDINATES_PATH, load_district_coordinates
+from shared_data import source_fingerprint
+
+EARTH_RADIUS_KM = 6371.0088
+BATCH_SIZE = 250_000
+
+
+class DistrictGeocoder:
+    """Nearest district centroid for batches of points."""
+
+    def __init__(self, coordinates):
+        known = ~np.isnan(coordinates).any(axis=1)
+        self.ids = np.flatnonzero(known).astype(np.int16)
+        self.tree = BallTree(np.radians(coordinates[known]), metric='haversine')
+
+    def nearest(self, latitude, longitude, batch_size=BATCH_SIZE):
+        """District ID of the nearest centroid and the distance to it in km, per point.
+
+        Points with a missing coordinate get ID -1 and distance NaN.
+        """
+        points = np.radians(np.column_stack([np.asarray(latitude, dtype=np.float64),
+                                             np.asarray(longitude, dtype=np.float64)]))
+        ids = np.full(len(points), -1, dtype=np.int16)
+        distances = np.full(len(points), np.nan)
+        valid = np.flatnonzero(~np.isnan(points).any(axis=1))
+        for start in range(0, len(valid), batch_size):
+            rows = valid[start:start + batch_size]
+            distance, index = self.tree.query(points[rows], k=1)
+            ids[rows] = self.ids[index[:, 0]]
+            distances[rows] = distance[:, 0] * EARTH_RADIUS_KM
+        return ids, distances
+
+
+_geocoders = {}
+_lock = threading.Lock()
+
+
+def get_geocoder(path=COORDINATES_PATH):
+    """Process-wide DistrictGeocoder for the centroids at ``path``, rebuilt when the file changes."""
+    key = source_fingerprint([path])
+    with _lock:
+        geocoder = _geocoders.get(key)
+        if geocoder is None:
+            geocoder = DistrictGeocoder(load_district_coordinates(path))
+            _geocoders.clear()
+            _geocoders[key] = geocoder
+    return geocoder
@@ -0,0 +1,184 @@
+# app/hotspots.py
+"""Spatial hotspots of per-district counts: Getis-Ord Gi* and local Moran's I.
+
+District contiguity (queen: polygons that share any boundary point) is
+derived from the district shapes once, saved to the cache as a sparse matrix
+and kept for the life of the process. Both statistics are then a sparse
+matrix-vector product over a count vector indexed by district ID, so they can
+be recomputed on every filter change.
+
+Significance comes from a conditional permutation test. Each simulation
+shuffles the districts once and gives every district the first k of the
+shuffled values other than its own, k being its number of neighbours. All
+districts of a chunk of simulations are evaluated with array operations, and
+chunks run on a thread pool.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from cache_utils import cache_path
+from districts import N_DISTRICTS, SHAPES_PATH, load_district_shapes
+from shared_data import source_fingerprint
+
+PERMUTATIONS = 999
+ALPHA = 0.05
+WORKERS = 4
+CHUNK = 250
+
+HOTSPOT_CLASSES = ('Hot spot', 'Cold spot', 'Not significant')
+LISA_CLASSES = ('High-High', 'Low-Low', 'High-Low', 'Low-High', 'Not significant')
+
+
+class ContiguityWeights:
+    """Binary contiguity between the districts that have shapes.
+
+    ``ids`` are the district IDs of the matrix rows, in order; ``neighbors``
+    is a (n, max_k) array of row positions padded with -1.
+    """
+
+    def __init__(self, ids, matrix):
+        self.ids = ids
+        self.matrix = matrix.tocsr()
+        self.cardinalities = np.diff(self.matrix.indptr)
+        self.neighbors = np.full((len(ids), max(self.cardinalities.max(), 1)), -1, dtype=np.intp)
+        for i in range(len(ids)):
+            row = self.matrix.indices[self.matrix.indptr[i]:self.matrix.indptr[i + 1]]
+            self.neighbors[i, :len(row)] = row
+
+    @property
+    def islands(self):
+        """District IDs without any neighbour."""
+        return self.ids[self.cardinalities == 0]
+
+
+def build_contiguity(path=SHAPES_PATH):
+    """Queen contiguity of the district shapes, as a ContiguityWeights."""
+    shapes = load_district_shapes(path)
+    ids = np.unique(shapes['district_id'].to_numpy())
+    rows, cols = shapes.sindex.query(shapes.geometry, predicate='intersects')
+    position = np.full(N_DISTRICTS, -1, dtype=np.intp)
+    position[ids] = np.arange(len(ids))
+    rows = position[shapes['district_id'].to_numpy()[rows]]
+    cols = position[shapes['district_id'].to_numpy()[cols]]
+    keep = rows != cols
+    matrix = sp.coo_matrix((np.ones(keep.sum()), (rows[keep], cols[keep])), shape=(len(ids), len(ids)))
+    matrix = matrix.tocsr()
+    matrix.data[:] = 1.0  # districts made of several polygons may touch more than once
+    return ContiguityWeights(ids, matrix)
+
+
+_weights = {}
+_lock = threading.Lock()
+
+
+def get_contiguity(path=SHAPES_PATH):
+    """Process-wide contiguity weights, loaded from the cache or built once per shapes file."""
+    key = source_fingerprint([path])
+    with _lock:
+        weights = _weights.get(key)
+        if weights is None:
+            file = cache_path(f"contiguity-{key}.npz")
+            if os.path.exists(file):
+                with np.load(file) as saved:
+                    ids, indices, indptr = saved['ids'], saved['indices'], saved['indptr']
+                matrix = sp.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(ids), len(ids)))
+                weights = ContiguityWeights(ids, matrix)
+            else:
+                weights = build_contiguity(path)
+                np.savez(file, ids=weights.ids, indices=weights.matrix.indices, indptr=weights.matrix.indptr)
+            _weights.clear()
+            _weights[key] = weights
+    return weights
+
+
+def _simulated_lags(x, weights, permutations, seed):
+    """(permutations, n) sums of k_i values drawn without replacement from the other districts."""
+    n, max_k = weights.neighbors.shape
+    rng = np.random.default_rng(seed)
+    order = rng.permuted(np.broadcast_to(np.arange(n), (permutations, n)), axis=1)[:, :max_k + 1]
+    # Skip the district's own value if drawn, then keep the first k_i of the rest
+    others = order[:, None, :] != np.arange(n)[None, :, None]
+    taken = others & (np.cumsum(others, axis=2) <= weights.cardinalities[None, :, None])
+    return np.where(taken, x[order][:, None, :], 0.0).sum(axis=2)
+
+
+def _pseudo_p(observed, simulated):
+    """One-sided pseudo p-values on the side of the observed value; ties count against significance."""
+    extreme = np.minimum((simulated >= observed).sum(axis=0), (simulated <= observed).sum(axis=0))
+    return (extreme + 1) / (len(simulated) + 1)
+
+
+def local_statistics(counts, weights=None, permutations=PERMUTATIONS, seed=0, workers=WORKERS):
+    """Gi* and local Moran's I of ``counts`` (an array indexed by district ID).
+
+    Returns a dict of arrays of length N_DISTRICTS (NaN for districts without
+    a shape or neighbours): gi_star (z-score), gi_p, local_i and local_i_p,
+    the two permutation p-values, and z and lag, the district's and its
+    neighbours' mean deviation from the overall mean. Constant counts (such as
+    an empty filter) have no hotspots and give NaN statistics with p = 1.
+    """
+    weights = weights or get_contiguity()
+    x = np.asarray(counts, dtype=np.float64)[weights.ids]
+    n = len(x)
+    k = weights.cardinalities.astype(np.float64)
+    lag = weights.matrix @ x
+
+    # Gi*: neighbours plus the district itself, all with weight 1
+    mean = x.mean()
+    s = np.sqrt((x ** 2).mean() - mean ** 2)
+    w_star = k + 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gi_star = (x + lag - mean * w_star) / (s * np.sqrt((n * w_star - w_star ** 2) / (n - 1)))
+
+    # Local Moran's I with row-standardized weights
+    z = x - mean
+    m2 = (z ** 2).mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        local_i = z / m2 * (lag / k - mean)
+
+    # Both statistics depend on the neighbours only through their sum, so one set
+    # of simulated sums serves both tests
+    seeds = np.random.SeedSequence(seed).spawn(-(-permutations // CHUNK))
+    sizes = [min(CHUNK, permutations - i * CHUNK) for i in range(len(seeds))]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        lags = np.concatenate(list(executor.map(lambda a: _simulated_lags(x, weights, *a), zip(sizes, seeds))))
+    gi_p = _pseudo_p(lag, lags)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        local_i_p = _pseudo_p(local_i, z / m2 * (lags / k - mean))
+
+    if s == 0:
+        gi_p = local_i_p = np.ones(n)
+
+    result = {}
+    for name, values in (('gi_star', gi_star), ('gi_p', gi_p), ('local_i', local_i), ('local_i_p', local_i_p)):
+        full = np.full(N_DISTRICTS, np.nan)
+        full[weights.ids] = np.where(k > 0, values, np.nan)
+        result[name] = full
+    result['z'] = np.full(N_DISTRICTS, np.nan)
+    result['z'][weights.ids] = z
+    result['lag'] = np.full(N_DISTRICTS, np.nan)
+    result['lag'][weights.ids] = np.where(k > 0, lag / np.maximum(k, 1) - mean, np.nan)
+    return result
+
+
+def classify_hotspots(stats, alpha=ALPHA):
+    """'Hot spot', 'Cold spot' or 'Not significant' per district from the Gi* results."""
+    significant = stats['gi_p'] < alpha
+    labels = np.full(N_DISTRICTS, HOTSPOT_CLASSES[2], dtype=object)
+    labels[significant & (stats['gi_star'] > 0)] = HOTSPOT_CLASSES[0]
+    labels[significant & (stats['gi_star'] < 0)] = HOTSPOT_CLASSES[1]
+    return labels
+
+
+def classify_clusters(stats, alpha=ALPHA):
+    """Moran scatterplot quadrant of each significant district, else 'Not significant'."""
+    significant = stats['local_i_p'] < alpha
+    high, high_lag = stats['z'] > 0, stats['lag'] > 0
+    labels = np.full(N_DISTRICTS, LISA_CLASSES[4], dtype=object)
+    for label, mask in zip(LISA_CLASSES, (high & high_lag, ~high & ~high_lag, high & ~high_lag, ~high & high_lag)):
+        labels[significant & mask] = label
+    return labels
@@ -0,0 +1,203 @@
+# app/jobs.py
+"""Process-wide background job scheduler shared by every dashboard session.
+
+Jobs are identified by a hashable key. Submitting a key that is already
+queued, running or finished returns the existing job, so an expensive
+computation runs once no matter how many sessions ask for it. Failed jobs
+are kept too, until ``forget`` (the Retry button of ``show_progress``)
+removes them, so a failing task is not relaunched on every rerun. Task functions
+report progress (and optionally a partial result) through ``report_progress``.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MAX_WORKERS = 4
+MAX_PENDING = 32
+MAX_RESULTS = 64
+
+_local = threading.local()
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the scheduler already holds MAX_PENDING unfinished jobs."""
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = 'Queued'
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.done
+
+    def report(self, progress, message=None, partial=None):
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if partial is not None:
+            self.partial = partial
+
+
+def report_progress(progress, message=None, partial=None):
+    """Update the progress of the job running on this thread; a no-op outside a job."""
+    job = getattr(_local, 'job', None)
+    if job is not None:
+        job.report(progress, message, partial)
+
+
+class JobScheduler:
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING, max_results=MAX_RESULTS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='agri-job')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._max_results = max_results
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Return the job for ``key``, starting ``fn(*args, **kwargs)`` if it is not known yet.
+
+        A failed job is returned as it is; ``forget`` it to run it again.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+                return job
+            if not self._slots.acquire(blocking=False):
+                raise JobQueueFull(f"{MAX_PENDING} jobs are already waiting; try again shortly")
+            job = Job(key)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            self._evict()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def try_submit(self, key, fn, *args, **kwargs):
+        """Like ``submit``, but returns a 'busy' placeholder job instead of raising JobQueueFull.
+
+        The placeholder is never started or stored; pages render it like any
+        unfinished job and keep polling, and the next rerun submits again.
+        """
+        try:
+            return self.submit(key, fn, *args, **kwargs)
+        except JobQueueFull:
+            job = Job(key)
+            job.status = 'busy'
+            job.message = 'Server busy, retrying shortly'
+            return job
+
+    def _run(self, job, fn, args, kwargs):
+        _local.job = job
+        job.status = 'running'
+        job.message = 'Running'
+        try:
+            job.result = fn(*args, **kwargs)
+            job.progress = 1.0
+            job.message = 'Done'
+            job.status = 'done'
+        except Exception as exc:  # surfaced to the pages through job.error
+            job.error = exc
+            job.message = f"Failed: {exc}"
+            job.status = 'failed'
+        finally:
+            _local.job = None
+            job.finished_at = time.time()
+            job._done.set()
+            self._slots.release()
+
+    def _evict(self):
+        """Drop the least recently used finished jobs beyond MAX_RESULTS."""
+        finished = [key for key, job in self._jobs.items() if job.done]
+        for key in finished[:max(len(finished) - self._max_results, 0)]:
+            del self._jobs[key]
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def forget(self, key):
+        """Remove a finished (or failed) job so the next submit recomputes it."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.done:
+                del self._jobs[key]
+
+    def active(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.done]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def process_pool(max_workers=None, initializer=None, initargs=()):
+    """ProcessPoolExecutor for job functions, with spawned rather than forked workers.
+
+    Jobs run on threads of a multi-threaded server; a forked child inherits
+    any lock another thread held at that moment and can deadlock on it. By
+    default each pool gets an equal share of the CPUs among the MAX_WORKERS
+    jobs that may run at once (at least one worker), so concurrent jobs do
+    not start a full set of interpreters each.
+    """
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 1) // MAX_WORKERS)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=initializer, initargs=initargs)
+
+
+def get_scheduler():
+    """Scheduler shared by all sessions of this server process."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
+
+
+def show_progress(job, label):
+    """Render a progress bar for an unfinished (or busy) job; returns True once it has finished.
+
+    A failed job shows its error and a Retry button that forgets it and reruns the page.
+    """
+    import streamlit as st
+
+    if job.status == 'failed':
+        st.error(f"{label} failed: {job.error}")
+        if st.button("Retry", key=f"retry-{label}"):
+            get_scheduler().forget(job.key)
+            st.rerun()
+        return True
+    if job.done:
+        return True
+    st.progress(job.progress, text=f"{label}: {job.message}")
+    return False
+
+
+def poll(jobs, interval=1.0):
+    """Rerun the page after ``interval`` seconds while any of ``jobs`` is unfinished.
+
+    Call this last in a page so everything available is rendered first.
+    """
+    import streamlit as st
+
+    if any(job is not None and not job.done for job in jobs):
+        time.sleep(interval)
+        st.rerun()
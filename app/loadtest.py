@@ -0,0 +1,294 @@
+# app/loadtest.py
+"""Concurrent-session load test for the dashboard pages.
+
+Replays scripted sessions for each page in-process with Streamlit's AppTest
+and writes rerun latency percentiles, throughput and per-session memory to a
+JSON file. ``jobs.poll`` is replaced by a stub that only records the
+unfinished jobs, so every script run is timed on its own; the harness waits
+for those jobs outside the timing, reruns the page as poll() would, and
+reports how long the background jobs took to complete as a separate metric.
+Run from the repository root:
+
+    python app/loadtest.py --sessions 50 --output loadtest_results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import numpy as np
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import jobs  # noqa: E402
+
+PENDING_KEY = "_loadtest_pending_jobs"
+
+
+def pin_runtime():
+    """Keep one mock Runtime installed for the whole load test.
+
+    AppTest installs a mock Runtime before each run and removes it afterwards,
+    so overlapping runs from different threads see it vanish mid-script.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+def record_poll(polled, interval=1.0):
+    """Stand-in for ``jobs.poll``: remember the unfinished jobs instead of sleeping and rerunning."""
+    st.session_state[PENDING_KEY] = [job for job in polled if job is not None and not job.done]
+
+
+def stub_poll():
+    """Route the pages' poll() calls to ``record_poll``; pages import it afresh on every run."""
+    jobs.poll = record_poll
+
+
+def open_page(path, timeout):
+    """New session of the multipage app, pointed at one of its pages.
+
+    Every session shares app.py as its main script, as in the real server;
+    AppTest's page registry is global, so sessions started from different
+    main scripts would run each other's pages.
+    """
+    at = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=timeout)
+    return at.switch_page(path)
+
+
+def _widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def climate_trends_session(at, rng, steps):
+    """Pick different district combinations for the precipitation comparison."""
+    for _ in range(steps):
+        districts = _widget(at.multiselect, 'Select Districts (max 10 for clear comparison):')
+        districts.set_value(rng.sample(list(districts.options), rng.randint(1, 4)))
+        yield "select districts"
+
+
+def atlas_session(at, rng, steps):
+    """Drag the year-range slider and toggle disaster types."""
+    for i in range(steps):
+        if i % 2 == 0:
+            slider = _widget(at.sidebar.slider, "Select Year Range")
+            low, high = slider.min, slider.max
+            start = rng.randint(low, high)
+            slider.set_range(start, rng.randint(start, high))
+            yield "drag year slider"
+        else:
+            types = _widget(at.sidebar.multiselect, "Select Disaster Types")
+            types.set_value(rng.sample(list(types.options), rng.randint(1, len(types.options))))
+            yield "select disaster types"
+
+
+def crop_yields_session(at, rng, steps):
+    """Predict yields for random districts, years and models."""
+    for _ in range(steps):
+        district = _widget(at.selectbox, "Select District")
+        district.set_value(rng.choice(list(district.options)))
+        _widget(at.number_input, "Year").set_value(rng.randint(2023, 2035))
+        model = _widget(at.radio, "Choose Prediction Model")
+        model.set_value(rng.choice(list(model.options)))
+        _widget(at.button, "Predict Yield").click()
+        yield "predict yield"
+
+
+def extreme_events_session(at, rng, steps):
+    """Look up disaster risk for random locations and months."""
+    for _ in range(steps):
+        _widget(at.number_input, "Latitude").set_value(round(rng.uniform(26.5, 30.3), 4))
+        _widget(at.number_input, "Longitude").set_value(round(rng.uniform(80.2, 88.1), 4))
+        yield "look up risk"
+
+
+PAGES = {
+    "climate_trends": ("pages/climate_trends.py", climate_trends_session),
+    "extreme_synthetic": ("pages/extreme_synthetic.py", atlas_session),
+    "crop_yields": ("pages/crop_yields.py", crop_yields_session),
+    "extreme_events": ("pages/extreme_events.py", extreme_events_session),
+}
+
+
+def run_until_settled(at, timeout):
+    """Run the page, then rerun it as poll() would until none of the jobs it polls is pending.
+
+    Returns the duration of every script run and the jobs that were waited for.
+    """
+    durations, waited = [], []
+    while True:
+        at.session_state[PENDING_KEY] = []
+        start = time.perf_counter()
+        at.run()
+        durations.append(time.perf_counter() - start)
+        pending = at.session_state[PENDING_KEY]
+        if at.exception or not pending:
+            return durations, waited
+        waited.extend(job for job in pending if job.status != 'busy')
+        deadline = time.perf_counter() + timeout
+        for job in pending:
+            if job.status == 'busy':
+                # Never started because the queue was full; the rerun submits it again
+                time.sleep(1.0)
+            elif not job.wait(max(deadline - time.perf_counter(), 0)):
+                raise TimeoutError(f"Job {job.key[0]!r} did not finish within {timeout}s")
+
+
+def run_session(page, session_id, steps, timeout, think_time):
+    """Run one scripted session and return a record per script run, plus the jobs it waited for."""
+    path, scenario = PAGES[page]
+    rng = random.Random(session_id)
+    at = open_page(path, timeout)
+    records = []
+    waited = []
+
+    def timed_run(step):
+        try:
+            durations, step_jobs = run_until_settled(at, timeout)
+            waited.extend(step_jobs)
+            error = at.exception[0].message if at.exception else None
+        except Exception as exc:  # a timeout or crash counts against the page, not the harness
+            durations, error = [], repr(exc)
+        for i, duration in enumerate(durations):
+            records.append({"page": page, "session": session_id, "step": step if i == 0 else f"{step} (poll)",
+                            "latency": duration, "error": error if i == len(durations) - 1 else None})
+        if not durations:
+            records.append({"page": page, "session": session_id, "step": step, "latency": 0.0, "error": error})
+        return error is None
+
+    if timed_run("initial load"):
+        try:
+            for step in scenario(at, rng, steps):
+                time.sleep(think_time)
+                if not timed_run(step):
+                    break
+        except Exception as exc:  # the page did not render the widgets the script expects
+            records.append({"page": page, "session": session_id, "step": "script",
+                            "latency": 0.0, "error": repr(exc)})
+    return records, waited
+
+
+def _summary(records, wall_time):
+    latencies = np.array([r["latency"] for r in records if r["error"] is None])
+    summary = {
+        "reruns": len(records),
+        "errors": sum(r["error"] is not None for r in records),
+        "throughput_reruns_per_s": len(records) / wall_time if wall_time else None,
+    }
+    if latencies.size:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary.update(latency_p50_s=float(p50), latency_p95_s=float(p95),
+                       latency_p99_s=float(p99), latency_max_s=float(latencies.max()))
+    return summary
+
+
+def _job_summary(waited):
+    """Time from submission to completion of each distinct background job, per job name."""
+    durations = {}
+    for job in {id(job): job for job in waited}.values():
+        if job.finished_at is not None:
+            durations.setdefault(str(job.key[0]), []).append(job.finished_at - job.submitted)
+    summary = {}
+    for name, values in sorted(durations.items()):
+        p50, p95 = np.percentile(values, [50, 95])
+        summary[name] = {"jobs": len(values), "completion_p50_s": float(p50), "completion_p95_s": float(p95),
+                         "completion_max_s": float(max(values))}
+    return summary
+
+
+def measure_session_memory(page, samples, steps, timeout):
+    """Python heap retained per live session, from tracemalloc, after warm-up."""
+    run_session(page, -1, steps, timeout, 0)  # warm shared caches and imports first
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for i in range(samples):
+        path, scenario = PAGES[page]
+        at = open_page(path, timeout)
+        run_until_settled(at, timeout)
+        for _ in scenario(at, random.Random(i), steps):
+            run_until_settled(at, timeout)
+        sessions.append(at)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent dashboard sessions and report latency.")
+    parser.add_argument("--pages", nargs="+", choices=sorted(PAGES), default=sorted(PAGES))
+    parser.add_argument("--sessions", type=int, default=50, help="sessions in total, spread over the pages")
+    parser.add_argument("--concurrency", type=int, default=None, help="sessions running at once (default: all)")
+    parser.add_argument("--steps", type=int, default=5, help="interactions per session after the initial load")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between interactions, seconds")
+    parser.add_argument("--timeout", type=float, default=300, help="per-rerun and per-job timeout, seconds")
+    parser.add_argument("--memory-samples", type=int, default=3, help="sessions per page for the memory probe")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    pin_runtime()
+    stub_poll()
+    # Session threads are not script threads; Streamlit warns about that on every widget access
+    logging.getLogger("streamlit.runtime.scriptrunner.script_run_context").setLevel(logging.ERROR)
+    plan = [(args.pages[i % len(args.pages)], i) for i in range(args.sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency or args.sessions) as executor:
+        futures = [executor.submit(run_session, page, i, args.steps, args.timeout, args.think_time)
+                   for page, i in plan]
+        sessions = [(page, future.result()) for (page, _), future in zip(plan, futures)]
+    wall_time = time.perf_counter() - start
+    records = [record for _, (session_records, _) in sessions for record in session_records]
+
+    results = {
+        "config": {**vars(args), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "wall_time_s": wall_time,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "overall": _summary(records, wall_time),
+        "pages": {},
+        "errors": sorted({r["error"] for r in records if r["error"] is not None}),
+    }
+    for page in args.pages:
+        page_records = [r for r in records if r["page"] == page]
+        results["pages"][page] = _summary(page_records, wall_time)
+        results["pages"][page]["background_jobs"] = _job_summary(
+            [job for session_page, (_, waited) in sessions if session_page == page for job in waited]
+        )
+        if args.memory_samples:
+            results["pages"][page]["memory_per_session_bytes"] = measure_session_memory(
+                page, args.memory_samples, args.steps, args.timeout
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    overall = results["overall"]
+    print(f"{overall['reruns']} reruns in {wall_time:.1f}s, {overall['errors']} errors; "
+          f"p50 {overall.get('latency_p50_s', float('nan')):.3f}s "
+          f"p95 {overall.get('latency_p95_s', float('nan')):.3f}s "
+          f"p99 {overall.get('latency_p99_s', float('nan')):.3f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
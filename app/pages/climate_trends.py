@@ -1,8 +1,20 @@
+import hashlib
+import os
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import uuid
 from datetime import datetime
+from jobs import get_scheduler, report_progress, show_progress, poll
+from cache_utils import cache_path
+from shared_data import source_fingerprint
+from figure_codec import DECODER_JS, PLOTLY_JS_URL, figure_to_compact_json, plotly_chart
+from climate_data import CLIMATE_DATA_PATH, load_climate_data
+from districts import DISTRICTS, district_geojson, district_id, district_ids, district_names, per_district
+from forecasting import VARIABLES, forecast_all
+from climatology import BASELINE_YEARS, get_climatology
+from visualization import anomaly_heatmap, anomaly_map_chart, forecast_band_chart
 import streamlit as st
 import streamlit as st
 
@@ -12,37 +24,8 @@ def show_page():
 
 
 
-# Load and clean data
-def load_and_clean_data(file_path):
-    df = pd.read_csv(file_path)
-    
-    # Remove any rows with missing critical values
-    df = df.dropna(subset=['date', 't2m', 'prectot', 'district', 'year', 'month'])
-    
-    # Convert data types
-    df['date'] = pd.to_datetime(df['date'])
-    df['year'] = df['year'].astype(int)
-    df['month'] = df['month'].astype(int)
-    df['t2m'] = df['t2m'].astype(float)
-    df['prectot'] = df['prectot'].astype(float)
-    
-    # Add season column
-    def get_season(month):
-        if month in [12, 1, 2]:
-            return 'Winter'
-        elif month in [3, 4, 5]:
-            return 'Spring'
-        elif month in [6, 7, 8]:
-            return 'Monsoon'
-        else:
-            return 'Autumn'
-    
-    df['season'] = df['month'].apply(get_season)
-    
-    return df
-
 # Create visualizations
-def create_visualizations(df):
+def create_visualizations(df, selected_districts):
     # 1. Yearly Temperature Trend (unchanged)
     yearly_temp = df.groupby('year')['t2m'].mean().reset_index()
     fig1 = px.line(yearly_temp, x='year', y='t2m', 
@@ -50,21 +33,11 @@ def create_visualizations(df):
                   labels={'t2m': 'Temperature (°C)', 'year': 'Year'})
 
     # 2. Enhanced Seasonal Precipitation Comparison
-    st.subheader("District Precipitation Comparison")
-    
-    # Create multiselect widget
-    districts = df['district'].unique().tolist()
-    selected_districts = st.multiselect(
-        'Select Districts (max 10 for clear comparison):',
-        options=districts,
-        default=['Kathmandu', 'Kaski'],  # Example defaults
-        max_selections=10
-    )
-    
     # Filter data for selected districts
     if len(selected_districts) > 0:
-        district_data = df[df['district'].isin(selected_districts)]
-        seasonal_precip = district_data.groupby(['district', 'season'])['prectot'].mean().reset_index()
+        district_data = df[df['district_id'].isin(district_ids(selected_districts))]
+        seasonal_precip = district_data.groupby(['district_id', 'season'])['prectot'].mean().reset_index()
+        seasonal_precip['district'] = district_names(seasonal_precip['district_id'])
         
         # Create comparison chart
         fig2 = px.bar(seasonal_precip, 
@@ -95,25 +68,32 @@ def create_visualizations(df):
 # Find interesting fact
 def find_interesting_fact(df):
     winter_data = df[df['season'] == 'Winter']
-    high_precip_winter = winter_data.groupby('district')['prectot'].mean().sort_values(ascending=False).head(1)
+    winter_precip = per_district(winter_data['district_id'], winter_data['prectot'], how='mean')
     
-    if not high_precip_winter.empty:
-        district = high_precip_winter.index[0]
-        precip_value = high_precip_winter.iloc[0]
+    if not winter_data.empty:
+        wettest = np.nanargmax(winter_precip)
+        district = DISTRICTS[wettest]
+        precip_value = winter_precip[wettest]
         return f"{district} has an unusually high average precipitation of {precip_value:.2f} mm in Winter, a typically dry season!"
     return "No unusual precipitation trends found in Winter."
 
 # Main function to generate report
-def generate_climate_report(file_path, output_html='climate_trend_report.html'):
-    # Load and clean data
-    df = load_and_clean_data(file_path)
+def generate_climate_report(file_path, selected_districts=('Kathmandu', 'Kaski'),
+                            output_html='climate_trend_report.html', df=None):
+    # Load and clean data, unless the caller already has it
+    if df is None:
+        report_progress(0.1, "Loading data")
+        df = load_climate_data(file_path)
     
     # Create visualizations
-    fig1, fig2, fig3 = create_visualizations(df)
+    report_progress(0.4, "Creating visualizations")
+    fig1, fig2, fig3 = create_visualizations(df, list(selected_districts))
     
     # Find interesting fact
     interesting_fact = find_interesting_fact(df)
     
+    report_progress(0.7, "Writing HTML report")
+    
     # Generate HTML report
     html_content = f"""
     <!DOCTYPE html>
@@ -123,7 +103,7 @@ def generate_climate_report(file_path, output_html='climate_trend_report.html'):
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Climate Trends in Nepal</title>
         <script src="https://cdn.tailwindcss.com"></script>
-        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+        <script src="{PLOTLY_JS_URL}"></script>
     </head>
     <body class="bg-gray-100 font-sans">
         <div class="container mx-auto p-6">
@@ -182,55 +162,143 @@ def generate_climate_report(file_path, output_html='climate_trend_report.html'):
         </div>
         
         <script>
-            Plotly.newPlot('temp-trend', {fig1.to_json()}, {{responsive: true}});
-            Plotly.newPlot('precip-bar', {fig2.to_json()}, {{responsive: true}});
-            Plotly.newPlot('temp-precip-scatter', {fig3.to_json()}, {{responsive: true}});
+            {DECODER_JS}
+            Plotly.newPlot('temp-trend', decodeFigure({figure_to_compact_json(fig1)}), {{responsive: true}});
+            Plotly.newPlot('precip-bar', decodeFigure({figure_to_compact_json(fig2)}), {{responsive: true}});
+            Plotly.newPlot('temp-precip-scatter', decodeFigure({figure_to_compact_json(fig3)}), {{responsive: true}});
         </script>
     </body>
     </html>
     """
     
-    # Save HTML report
-    with open(output_html, 'w') as f:
+    # Save HTML report; concurrent reports must never leave a half-written file
+    tmp_html = f"{output_html}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_html, 'w') as f:
         f.write(html_content)
+    os.replace(tmp_html, output_html)
     
     return fig1, fig2, fig3, interesting_fact
 
-# Example usage
-if __name__ == "__main__":
-    file_path = "data/processed_temp_precipitation.csv"
-    fig1, fig2, fig3, fact = generate_climate_report(file_path)
-    print("Report generated: climate_trend_report.html")
-    print("Interesting Fact:", fact)
+def show_page():
+    st.title("Climate Trends in Nepal (1981-2019)")
 
+    st.header("Summary")
+    st.write("""
+    This report analyzes temperature and precipitation trends across various districts in Nepal from 1981 to 2019.
+    The data reveals seasonal patterns, with Monsoon seasons showing significantly higher precipitation and temperatures peaking in Spring and Monsoon.
+    """)
 
-import streamlit as st
+    # Data loading and report building run in the background, shared by every session
+    scheduler = get_scheduler()
+    # Keyed by the file's fingerprint so new months replace the data, report and forecasts
+    source = source_fingerprint([CLIMATE_DATA_PATH])
+    data_job = scheduler.try_submit(("climate_data", CLIMATE_DATA_PATH, source), load_climate_data, CLIMATE_DATA_PATH)
+    if not show_progress(data_job, "Loading climate data"):
+        poll([data_job])
+        return
+    if data_job.status == 'failed':
+        return
+    df = data_job.result
+
+    st.subheader("District Precipitation Comparison")
+    selected_districts = st.multiselect(
+        'Select Districts (max 10 for clear comparison):',
+        options=df['district'].unique().tolist(),
+        default=['Kathmandu', 'Kaski'],  # Example defaults
+        max_selections=10
+    )
 
-#file_path = "../../data/processed_temp_precipitation.csv"
-#fig1, fig2, fig3, fact = generate_climate_report(file_path)
+    # Each selection gets its own report file in the cache, so sessions never overwrite each other
+    report_key = hashlib.sha1("|".join(selected_districts).encode()).hexdigest()[:12]
+    report_html = cache_path(f"climate_report-{source}-{report_key}.html")
+    report_job = scheduler.try_submit(
+        ("climate_report", CLIMATE_DATA_PATH, source, tuple(selected_districts)),
+        generate_climate_report, CLIMATE_DATA_PATH, tuple(selected_districts), output_html=report_html, df=df
+    )
+    if not show_progress(report_job, "Building climate report"):
+        poll([report_job])
+        return
+    if report_job.status == 'failed':
+        return
+    fig1, fig2, fig3, fact = report_job.result
+
+    st.header("Yearly Temperature Trend")
+    plotly_chart(fig1, use_container_width=True)
+
+    st.header("Seasonal Precipitation by District")
+    plotly_chart(fig2, use_container_width=True)
+
+    st.header("Temperature vs Precipitation")
+    plotly_chart(fig3, use_container_width=True)
 
-st.title("Climate Trends in Nepal (1981-2019)")
+    st.header("Interesting Fact")
+    st.info(fact)
 
-st.header("Summary")
-st.write("""
-This report analyzes temperature and precipitation trends across various districts in Nepal from 1981 to 2019.
-The data reveals seasonal patterns, with Monsoon seasons showing significantly higher precipitation and temperatures peaking in Spring and Monsoon.
-""")
+    st.header("Conclusion")
+    st.write("""
+    The analysis highlights a warming trend in Nepal, with significant precipitation during the Monsoon season.
+    These insights can inform agricultural planning and disaster preparedness.
+    """)
+    if os.path.exists(report_html):
+        with open(report_html, 'rb') as f:
+            st.download_button("Download HTML Report", f.read(), file_name="climate_trend_report.html",
+                               mime="text/html")
 
-st.header("Yearly Temperature Trend")
-st.plotly_chart(fig1, use_container_width=True)
+    # Standardized anomalies against the cached district x month baseline
+    st.header("Climate Anomalies")
+    climatology = get_climatology(CLIMATE_DATA_PATH)
+    baseline = f"{BASELINE_YEARS[0]}–{BASELINE_YEARS[1]}"
+    first_year, last_year = int(climatology.years[0]), int(climatology.years[-1])
+    col1, col2 = st.columns(2)
+    with col1:
+        anomaly_variable = st.radio("Anomaly Variable", options=list(VARIABLES),
+                                    format_func=lambda v: VARIABLES[v]['label'], horizontal=True)
+    with col2:
+        start, end = st.slider("Anomaly Period", min_value=first_year, max_value=last_year,
+                               value=(max(first_year, BASELINE_YEARS[1] + 1), last_year))
+    label = VARIABLES[anomaly_variable]['label'].split(' (')[0]
+    anomaly_map = climatology.anomaly_map(anomaly_variable, start, end)
+    plotly_chart(
+        anomaly_map_chart(district_geojson(), climatology.district_ids, climatology.district_names,
+                          anomaly_map[climatology.district_ids],
+                          f"Mean {label} Anomaly {start}–{end} (σ vs {baseline})"),
+        use_container_width=True
+    )
+    dates, matrix = climatology.anomaly_series(anomaly_variable, start, end)
+    plotly_chart(
+        anomaly_heatmap(dates, matrix, climatology.district_names, f"Monthly {label} Anomalies (σ vs {baseline})"),
+        precision=3, use_container_width=True
+    )
 
-st.header("Seasonal Precipitation by District")
-st.plotly_chart(fig2, use_container_width=True)
+    # Forecasts for every district are fitted once in the background and cached
+    st.header("District Climate Forecast")
+    forecast_job = scheduler.try_submit(("climate_forecast", CLIMATE_DATA_PATH, source), forecast_all, df)
+    forecasts = forecast_job.result if forecast_job.status == 'done' else forecast_job.partial
+    show_progress(forecast_job, "Fitting district forecasts")
 
-st.header("Temperature vs Precipitation")
-st.plotly_chart(fig3, use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        forecast_district = st.selectbox("Forecast District", options=sorted(df['district'].unique()))
+    with col2:
+        variable = st.radio("Variable", options=list(VARIABLES),
+                            format_func=lambda v: VARIABLES[v]['label'], horizontal=True)
 
-st.header("Interesting Fact")
-st.info(fact)
+    selected = None
+    if forecasts is not None:
+        selected = forecasts[(forecasts['district_id'] == district_id(forecast_district))
+                             & (forecasts['variable'] == variable)]
+    if selected is not None and not selected.empty:
+        history = df.loc[df['district_id'] == district_id(forecast_district), ['date', variable]].rename(columns={variable: 'value'})
+        history = history[history['date'] > history['date'].max() - pd.DateOffset(years=5)]
+        plotly_chart(
+            forecast_band_chart(history, selected, f"{VARIABLES[variable]['label']} Forecast: {forecast_district}",
+                                VARIABLES[variable]['label']),
+            use_container_width=True
+        )
+    elif forecast_job.status != 'failed':
+        st.info(f"The forecast for {forecast_district} is still being fitted.")
 
-st.header("Conclusion")
-st.write("""
-The analysis highlights a warming trend in Nepal, with significant precipitation during the Monsoon season.
-These insights can inform agricultural planning and disaster preparedness.
-""")
+    poll([forecast_job])
+
+if __name__ == "__main__":
+    show_page()
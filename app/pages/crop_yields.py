@@ -1,11 +1,17 @@
 import streamlit as st
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from xgboost import XGBRegressor
-from sklearn.metrics import r2_score, mean_squared_error
-from sklearn.model_selection import train_test_split
-from visualization import yield_trend_line, prediction_vs_actual
+from yield_models import load_agriculture, build_features, train_models
+from districts import district_id, district_ids
+from tuning import load_tuned_params
+from cache_utils import frame_fingerprint
+from jobs import get_scheduler, show_progress, poll
+from figure_codec import plotly_chart
+from explainability import EXPLAINED_MODELS, explain_models
+from yield_intervals import LEVEL, build_intervals
+from climate_data import CLIMATE_DATA_PATH, load_climate_data
+from scenarios import N_SCENARIOS, build_scenario_models, run_scenarios
+from shared_data import source_fingerprint
+from visualization import yield_trend_line, prediction_vs_actual, feature_importance_chart, forecast_band_chart
 import plotly.express as px
 import streamlit as st
 
@@ -14,31 +20,9 @@ def show_page():
     st.write("This is the Crop Yield Modeling page.")
 
 
-@st.cache_data
 def load_data():
-    df = pd.read_csv("data/processed_agriculture_data.csv")
-    melted = df.melt(id_vars=['DISTRICT_NAME'], var_name='metric_year', value_name='value')
-    melted[['metric', 'year']] = melted['metric_year'].str.rsplit('_', n=1, expand=True)
-    melted['year'] = melted['year'].str[:4]
-    melted['year'] = pd.to_numeric(melted['year'], errors='coerce').astype('Int64')
-    return melted.pivot_table(index=['DISTRICT_NAME', 'year'], columns='metric', values='value').reset_index()
-
-def train_models(X, y):
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    models = {
-        "Linear Regression": LinearRegression(),
-        "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
-        "XGBoost": XGBRegressor(random_state=42)
-    }
-
-    results = {}
-    for name, model in models.items():
-        model.fit(X_train, y_train)
-        preds = model.predict(X_test)
-        rmse = mean_squared_error(y_test, preds) ** 0.5
-        r2 = r2_score(y_test, preds)
-        results[name] = {"model": model, "rmse": rmse, "r2": r2}
-    return results, X_test, y_test
+    # Shared read-only view; see shared_data
+    return load_agriculture()
 
 def show_page():
     st.title("🌾 Crop Yield Prediction")
@@ -46,12 +30,24 @@ def show_page():
 
     # Load and preprocess data
     df = load_data()
-    features = df[['DISTRICT_NAME', 'year', 'VG_A']].dropna()
-    target = df.loc[features.index, 'VG_Y']
-
-    X_encoded = pd.get_dummies(features)
+    X_encoded, target = build_features(df)
     training_columns = X_encoded.columns.tolist()
-    model_results, X_test, y_test = train_models(X_encoded, target)
+
+    # Hyperparameters found offline by `python app/tuning.py`, when available
+    tuned_params = load_tuned_params(X_encoded, target)
+
+    # Training runs once in the background and is shared by every session
+    training_key = frame_fingerprint(X_encoded.assign(_target=target.values), tuned_params)
+    training_job = get_scheduler().try_submit(
+        ("train_models", training_key), train_models, X_encoded, target, params=tuned_params
+    )
+    # Bootstrap ensemble and its intervals for every district up to the last selectable year
+    interval_job = get_scheduler().try_submit(
+        ("yield_intervals", training_key), build_intervals, df, X_encoded, target,
+        range(int(df['year'].min()), 2036), params=(tuned_params or {}).get("XGBoost")
+    )
+    if tuned_params:
+        st.caption("Using tuned hyperparameters for: " + ", ".join(tuned_params))
 
     # Section 1: Yield trend comparison
     st.subheader("📊 Yield Comparison Over Time")
@@ -62,16 +58,27 @@ def show_page():
     )
 
     if selected_districts:
-        comparison_df = df[df['DISTRICT_NAME'].isin(selected_districts)]
+        comparison_df = df[df['district_id'].isin(district_ids(selected_districts))]
         fig = px.line(comparison_df, x='year', y='VG_Y', color='DISTRICT_NAME', markers=True,
                       labels={'VG_Y': 'Yield (tons/ha)', 'year': 'Year'},
                       title='District-wise Yield Trends')
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
     else:
         st.warning("Please select at least one district to compare.")
 
     # Section 2: Yield prediction input
     st.subheader("📌 Predict Future Crop Yield")
+
+    # Models that finished training so far, while the rest are still running
+    if training_job.status == 'done':
+        model_results, X_test, y_test = training_job.result
+    else:
+        model_results, X_test, y_test = training_job.partial or ({}, None, None)
+    show_progress(training_job, "Training yield models")
+    if not model_results:
+        poll([training_job, interval_job])
+        return
+
     col1, col2 = st.columns(2)
     with col1:
         district = st.selectbox("Select District", df['DISTRICT_NAME'].unique())
@@ -81,7 +88,12 @@ def show_page():
     area = st.number_input("Cultivation Area (hectares)", min_value=0.1, value=10.0)
     model_choice = st.radio("Choose Prediction Model", list(model_results.keys()))
 
-    if st.button("Predict Yield"):
+    # The inputs are kept in the session so the result survives the reruns of poll()
+    clicked = st.button("Predict Yield")
+    if clicked:
+        st.session_state['prediction'] = (district, year, area, model_choice)
+    if 'prediction' in st.session_state:
+        district, year, area, prediction_model = st.session_state['prediction']
         input_data = pd.DataFrame([{
             'DISTRICT_NAME': district,
             'year': year,
@@ -90,28 +102,119 @@ def show_page():
         input_encoded = pd.get_dummies(input_data)
         input_encoded = input_encoded.reindex(columns=training_columns, fill_value=0)
 
-        model = model_results[model_choice]['model']
+        model = model_results[prediction_model]['model']
         prediction = model.predict(input_encoded)[0]
 
         st.success(f"🌱 Predicted Yield: {prediction:.2f} tons/hectare")
+        if interval_job.status == 'done':
+            ensemble, _ = interval_job.result
+            _, lower, upper = ensemble.predict_interval(input_encoded)
+            st.info(f"{LEVEL:.0%} prediction interval (XGBoost bootstrap ensemble): "
+                    f"{lower[0]:.2f} – {upper[0]:.2f} tons/hectare")
         st.write("### 🧾 Prediction Summary")
         st.write(f"**District:** {district}")
         st.write(f"**Year:** {year}")
         st.write(f"**Cultivation Area:** {area} ha")
-        st.write(f"**Model Used:** {model_choice}")
-        st.write(f"**Model R²:** {model_results[model_choice]['r2']:.2f}")
-        st.write(f"**Model RMSE:** {model_results[model_choice]['rmse']:.2f}")
-        st.balloons()
+        st.write(f"**Model Used:** {prediction_model}")
+        st.write(f"**Model R²:** {model_results[prediction_model]['r2']:.2f}")
+        st.write(f"**Model RMSE:** {model_results[prediction_model]['rmse']:.2f}")
+        if clicked:
+            st.balloons()
 
         # Yield trend for selected district
         st.subheader("📈 Yield Trend for Selected District")
-        st.plotly_chart(yield_trend_line(df, district=district), use_container_width=True)
+        plotly_chart(yield_trend_line(df, district=district), use_container_width=True)
+        # Drawn on the first rerun after the ensemble finishes, whenever the prediction was made
+        if interval_job.status == 'done':
+            _, grid = interval_job.result
+            history = df[df['district_id'] == district_id(district)].dropna(subset=['VG_Y'])
+            band = grid[(grid['district_id'] == district_id(district)) & (grid['year'] > history['year'].max())]
+            fig = forecast_band_chart(history.rename(columns={'year': 'date', 'VG_Y': 'value'}),
+                                      band.rename(columns={'year': 'date'}),
+                                      f"Yield Outlook for {district} (latest cultivated area)",
+                                      'Yield (tons/ha)')
+            plotly_chart(fig.update_layout(xaxis_title='Year'), use_container_width=True)
+        else:
+            show_progress(interval_job, "Fitting bootstrap interval models")
 
     # Section 3: Model evaluation (optional)
     st.subheader("📉 Evaluate Model Performance")
     if st.checkbox("Show Prediction vs Actual on Test Set"):
         y_pred = model_results[model_choice]['model'].predict(X_test)
-        st.plotly_chart(prediction_vs_actual(y_test, y_pred), use_container_width=True)
+        plotly_chart(prediction_vs_actual(y_test, y_pred), use_container_width=True)
+
+    # Section 4: Climate scenarios with models that also see monsoon rainfall and temperature
+    st.subheader("🌦️ Climate Scenarios")
+    scenario_model_job = get_scheduler().try_submit(
+        ("scenario_models", training_key, source_fingerprint([CLIMATE_DATA_PATH])),
+        build_scenario_models, df, load_climate_data(CLIMATE_DATA_PATH), params=tuned_params
+    )
+    scenario_job = None
+    if show_progress(scenario_model_job, "Training climate-aware yield models") and scenario_model_job.status == 'done':
+        yearly, scenario_results, scenario_columns = scenario_model_job.result
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            rain_change = st.slider("Monsoon Rainfall Change (%)", min_value=-50, max_value=50, value=-20, step=5)
+        with col2:
+            temperature_change = st.slider("Temperature Change (°C)", min_value=-2.0, max_value=4.0,
+                                           value=0.0, step=0.5)
+        with col3:
+            scenario_year = st.number_input("Scenario Year", min_value=2014, max_value=2035, value=2024)
+        if st.button("Run Scenarios"):
+            st.session_state['scenario'] = (rain_change, temperature_change, scenario_year)
+        if 'scenario' in st.session_state:
+            rain_change, temperature_change, scenario_year = st.session_state['scenario']
+            scenario_job = get_scheduler().try_submit(
+                ("run_scenarios", training_key, rain_change, temperature_change, scenario_year),
+                run_scenarios, df, yearly, scenario_results, scenario_columns, scenario_year,
+                rain_change / 100, temperature_change
+            )
+            show_progress(scenario_job, "Simulating climate scenarios")
+        if scenario_job is not None and scenario_job.status == 'done':
+            summary = scenario_job.result[scenario_job.result['model'] == model_choice]
+            st.caption(f"{N_SCENARIOS:,} sampled climate years per district, {rain_change:+d}% monsoon "
+                       f"rainfall and {temperature_change:+.1f} °C in {scenario_year}, predicted by "
+                       f"{model_choice} (climate-aware R² {scenario_results[model_choice]['r2']:.2f}).")
+            summary = summary.sort_values('change_mean')
+            fig = px.bar(summary, x='DISTRICT_NAME', y='change_mean',
+                         error_y=summary['change_p95'] - summary['change_mean'],
+                         error_y_minus=summary['change_mean'] - summary['change_p05'],
+                         labels={'DISTRICT_NAME': 'District', 'change_mean': 'Yield change (tons/ha)'},
+                         title='Mean Yield Change with 90% Range')
+            fig.update_layout(xaxis_tickangle=-45)
+            plotly_chart(fig, use_container_width=True)
+            st.dataframe(summary[['DISTRICT_NAME', 'baseline_mean', 'scenario_mean', 'scenario_p05',
+                                  'scenario_p95', 'change_mean', 'prob_decline']].round(3),
+                         hide_index=True, use_container_width=True)
+    scenario_jobs = [scenario_model_job] + ([scenario_job] if scenario_job is not None else [])
+
+    # Section 5: Feature importance, computed once per trained model set
+    st.subheader("🔍 What Drives the Predictions")
+    if training_job.status != 'done':
+        st.info("Feature importance is available once all models have finished training.")
+        poll([training_job, interval_job] + scenario_jobs)
+        return
+    explain_job = get_scheduler().try_submit(
+        ("explain_models", training_key), explain_models, model_results, X_test, y_test, training_key
+    )
+    show_progress(explain_job, "Computing feature importance")
+    if explain_job.status == 'done':
+        explained = [name for name in EXPLAINED_MODELS if name in explain_job.result]
+        explain_choice = model_choice if model_choice in explained else explained[0]
+        importance = explain_job.result[explain_choice]
+        st.caption(f"Showing {explain_choice}. District dummies are permuted together as one feature.")
+        col1, col2 = st.columns(2)
+        with col1:
+            plotly_chart(feature_importance_chart(importance['native'], importance['feature'],
+                                                  title='Native Tree Importance'),
+                         use_container_width=True)
+        with col2:
+            plotly_chart(feature_importance_chart(importance['permutation'], importance['feature'],
+                                                  errors=importance['permutation_std'],
+                                                  title='Permutation Importance (R² drop)'),
+                         use_container_width=True)
+
+    poll([training_job, interval_job, explain_job] + scenario_jobs)
 
 if __name__ == "__main__":
     show_page()
@@ -1,12 +1,11 @@
 # app/pages/extreme_events.py
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import plotly.express as px
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
-from sklearn.preprocessing import LabelEncoder
+from risk_service import get_risk_service
+from jobs import show_progress, poll
+from figure_codec import plotly_chart
+from events_data import clean_events, load_events
 import streamlit as st
 
 def show_page():
@@ -14,59 +13,16 @@ def show_page():
     st.write("This is the Extreme Events page.")
 
 
-@st.cache_data
 def load_data():
-    # Load extreme weather data
-    df = pd.read_csv("data/processed_extreme_weather_events.csv")
-    
-    # Load Nepal districts GeoJSON
-    nepal_gdf = gpd.read_file("data/nepal-districts.geojson")
-    
-    return df, nepal_gdf
-
-def clean_data(df, nepal_gdf):
-    """Handle missing values and duplicates"""
-    # Drop exact duplicates
-    df = df.drop_duplicates(subset=['disno'])
-    
-    # Remove rows with default coordinates
-    df = df[~((df['latitude'] == 28.348895238095242) & 
-              (df['longitude'] == 83.59854761904762))]
-    
-    # Convert date column
-    df['start_date'] = pd.to_datetime(df['start_date'])
-    df['year'] = df['start_date'].dt.year
-    df['month'] = df['start_date'].dt.month
-    
-    return df
-
-def prepare_features(df):
-    """Feature engineering for ML model"""
-    # Encode disaster types
-    le = LabelEncoder()
-    df['disaster_encoded'] = le.fit_transform(df['disaster_type'])
-    
-    features = ['latitude', 'longitude', 'year', 'month']
-    target = 'disaster_encoded'
-    
-    return df[features], df[target], le
-
-def train_model(X, y):
-    """Train Random Forest classifier"""
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
-    
-    model = RandomForestClassifier(n_estimators=100, class_weight='balanced')
-    model.fit(X_train, y_train)
-    
-    return model, X_test, y_test
+    # Load extreme weather data (shared read-only view); events are placed in
+    # districts by the geocoder, so the district shapes are not needed here
+    return load_events()
 
 def show_page():
     st.title("🇳🇵 Extreme Weather Events Analysis")
     
     # Load data
-    df, nepal_gdf = load_data()
+    df = load_data()
     
     # Data cleaning section
     st.header("🧹 Data Cleaning")
@@ -74,10 +30,12 @@ def show_page():
         st.write(f"Original records: {len(df)}")
         st.write("Missing values:", df.isnull().sum())
     
-    df_clean = clean_data(df, nepal_gdf)
+    df_clean = clean_events(df)
     
     with st.expander("Cleaned Data Summary"):
         st.write(f"Cleaned records: {len(df_clean)}")
+        st.write("Records by location precision:", df_clean['level'].value_counts())
+        st.write("Records by nearest district:", df_clean['district'].value_counts())
         st.write("Common disaster types:", df_clean['disaster_type'].value_counts())
     
     # Visualization section
@@ -93,14 +51,15 @@ def show_page():
     # Filter data based on selection
     filtered_df = df_clean[df_clean['disaster_type'].isin(disaster_types)] if disaster_types else df_clean
     
-    # Create interactive map with animation
+    # Create interactive map with animation; country-level records have no real position
+    located_df = filtered_df[filtered_df['level'] == 'district']
     fig = px.scatter_mapbox(
-        filtered_df,
+        located_df,
         lat="latitude",
         lon="longitude",
         color="disaster_type",
         hover_name="disaster_type",
-        hover_data=["start_date", "year"],
+        hover_data=["start_date", "year", "district"],
         animation_frame="year",
         zoom=5,
         height=600,
@@ -114,7 +73,9 @@ def show_page():
         margin={"r":0,"t":40,"l":0,"b":0}
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
+    st.caption(f"{len(filtered_df) - len(located_df)} country-level records without a precise "
+               "location are not mapped but are counted below.")
     
     # Temporal distribution chart
     st.subheader("📅 Temporal Distribution")
@@ -126,42 +87,65 @@ def show_page():
         color='year',
         title="Events per Year"
     )
-    st.plotly_chart(fig2, use_container_width=True)
-    
-    # # ML Prediction Section
-    # st.header("🤖 Disaster Type Prediction")
-    
-    # # Prepare features and target
-    # X, y, le = prepare_features(df_clean)
+    plotly_chart(fig2, use_container_width=True)
     
-    # # Train model
-    # model, X_test, y_test = train_model(X, y)
-    
-    # # Prediction interface
-    # col1, col2, col3 = st.columns(3)
-    # with col1:
-    #     lat = st.number_input("Latitude", value=27.7172)
-    # with col2:
-    #     lon = st.number_input("Longitude", value=85.3240)
-    # with col3:
-    #     year = st.number_input("Year", min_value=1980, max_value=2030, value=2024)
-    
-    # month = st.selectbox("Month", options=range(1,13), format_func=lambda x: pd.to_datetime(x, format='%m').strftime('%B'))
-    
-    # if st.button("Predict Disaster Risk"):
-    #     input_data = pd.DataFrame([[lat, lon, year, month]], 
-    #                             columns=['latitude', 'longitude', 'year', 'month'])
-    #     prediction = model.predict(input_data)
-    #     disaster_type = le.inverse_transform(prediction)
-        
-    #     st.success(f"Predicted High Risk for: {disaster_type[0]}")
-    
-    # # Model evaluation
-    # st.subheader("Model Performance")
-    # y_pred = model.predict(X_test)
-    # report = classification_report(y_test, y_pred, target_names=le.classes_, output_dict=True)
-    # report_df = pd.DataFrame(report).transpose()
-    # st.dataframe(report_df.style.highlight_max(axis=0))
+    # ML Prediction Section
+    st.header("🤖 Disaster Type Prediction")
+
+    # The classifier is trained once in the background and shared across sessions.
+    # Country-level records only carry the placeholder centroid, so they are not
+    # locations the model can learn from.
+    service = get_risk_service()
+    service.start(df_clean[df_clean['level'] == 'district'])
+
+    if not show_progress(service.job, "Training disaster risk model"):
+        poll([service.job])
+        return
+    if not service.ready:
+        return
+
+    cube = service.cube
+
+    # Prediction interface
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        lat = st.number_input("Latitude", value=27.7172)
+    with col2:
+        lon = st.number_input("Longitude", value=85.3240)
+    with col3:
+        month = st.selectbox("Month", options=range(1, 13), format_func=lambda x: pd.to_datetime(x, format='%m').strftime('%B'))
+
+    risk = cube.lookup(lat, lon, month)
+    st.success(f"Predicted High Risk for: {risk.index[0]} ({risk.iloc[0]:.0%})")
+    fig3 = px.bar(
+        risk.reset_index(),
+        x='index',
+        y='probability',
+        title=f"Disaster Type Probabilities (reference year {cube.year})",
+        labels={'index': 'Event Type', 'probability': 'Probability'}
+    )
+    plotly_chart(fig3, use_container_width=True)
+
+    # Risk surface for the chosen month
+    risk_type = st.selectbox("Risk Map Disaster Type", options=cube.classes, index=cube.classes.index(risk.index[0]))
+    fig4 = px.density_mapbox(
+        cube.surface(month, risk_type),
+        lat='latitude',
+        lon='longitude',
+        z='probability',
+        radius=8,
+        zoom=5.5,
+        height=550,
+        center={"lat": 28.3949, "lon": 84.1240},
+        mapbox_style="carto-positron",
+        title=f"{risk_type} Risk Surface"
+    )
+    plotly_chart(fig4, use_container_width=True)
+
+    # Model evaluation
+    st.subheader("Model Performance")
+    report_df = pd.DataFrame(service.report).transpose()
+    st.dataframe(report_df.style.highlight_max(axis=0))
 
 if __name__ == "__main__":
     show_page()
@@ -8,6 +8,14 @@ import plotly.express as px
 from datetime import datetime, timedelta
 from shapely.geometry import Point
 import random
+from jobs import get_scheduler, report_progress, show_progress, poll
+from figure_codec import plotly_chart
+from shared_data import shared_frame
+from districts import N_DISTRICTS, SHAPES_PATH, district_crosstab, district_geojson, district_names, load_district_shapes
+from event_index import EventIndex
+from hotspots import (HOTSPOT_CLASSES, LISA_CLASSES, PERMUTATIONS, classify_clusters, classify_hotspots,
+                      get_contiguity, local_statistics)
+from visualization import hotspot_map_chart
 import streamlit as st
 
 def show_page():
@@ -29,6 +37,12 @@ DISASTER_TYPES = {
     'Glacial lake outburst flood': '#00ACC1'
 }
 
+# Types selected on first load: the first five generated, before the catalogue was sorted by year
+DEFAULT_DISASTER_TYPES = ['Mass movement (wet)', 'Earthquake', 'Wildfire', 'Epidemic', 'Flood']
+
+HOTSPOT_COLORS = dict(zip(HOTSPOT_CLASSES, ('#D7191C', '#2C7BB6', '#D9D9D9')))
+CLUSTER_COLORS = dict(zip(LISA_CLASSES, ('#D7191C', '#2C7BB6', '#FDAE61', '#ABD9E9', '#D9D9D9')))
+
 # Nepal boundaries for data generation
 NEPAL_BOUNDS = {
     'min_lat': 26.3478, 'max_lat': 30.4478,
@@ -42,7 +56,6 @@ def update_month_safely(date_obj, new_month):
     day = min(date_obj.day, days_in_month[new_month - 1])
     return date_obj.replace(month=new_month, day=day)
 
-@st.cache_data
 def generate_synthetic_data(num_events=2000):
     np.random.seed(42)  # For reproducibility
     start_date = datetime(2010, 1, 1)
@@ -111,34 +124,43 @@ def generate_synthetic_data(num_events=2000):
 
     return pd.DataFrame(data)
 
-@st.cache_data
-def load_and_enhance_data():
+def join_events_to_districts():
+    report_progress(0.1, "Generating events")
     events_df = generate_synthetic_data(2000)
-    nepal_gdf = gpd.read_file("data/nepal-districts.geojson")
-    district_col = 'DISTRICT'
-    nepal_gdf = nepal_gdf[[district_col, 'geometry']].rename(columns={district_col: 'district'})
+    report_progress(0.5, "Joining events to districts")
+    nepal_gdf = load_district_shapes()
     events_gdf = gpd.GeoDataFrame(
         events_df,
         geometry=events_df.apply(lambda row: Point(row['longitude'], row['latitude']), axis=1),
         crs=nepal_gdf.crs
     )
     enhanced_gdf = gpd.sjoin(events_gdf, nepal_gdf, how='left', predicate='within')
+    # Events outside every district polygon keep ID -1
+    enhanced_gdf['district_id'] = enhanced_gdf['district_id'].fillna(-1).astype(np.int16)
     enhanced_gdf['start_date'] = pd.to_datetime(enhanced_gdf['start_date'])
-    return enhanced_gdf, nepal_gdf
+    # Event points are not needed after the join; dropping them lets the table be memory-mapped.
+    # Sorted by year so EventIndex can use the shared rows as they are.
+    enhanced_df = pd.DataFrame(enhanced_gdf.drop(columns='geometry'))
+    return enhanced_df.sort_values('year', kind='stable', ignore_index=True)
+
+def load_and_enhance_data():
+    """Shared read-only index of the district-tagged events, and the district shapes."""
+    enhanced_df = shared_frame("atlas_events", [SHAPES_PATH], join_events_to_districts, version=3)
+    nepal_gdf = load_district_shapes()
+    return EventIndex(enhanced_df), nepal_gdf
 
-def create_interactive_dashboard(enhanced_gdf, nepal_gdf, year_range=None, disaster_types=None):
-    filtered_df = enhanced_gdf.copy()
-    if year_range:
-        filtered_df = filtered_df[(filtered_df['year'] >= year_range[0]) & (filtered_df['year'] <= year_range[1])]
-    if disaster_types:
-        filtered_df = filtered_df[filtered_df['disaster_type'].isin(disaster_types)]
-    district_stats = filtered_df.groupby('district').agg(
-        total_events=('disno', 'count'),
-        common_disaster=('disaster_type', lambda x: x.mode()[0] if not x.mode().empty else None),
-        last_event=('start_date', 'max')
-    ).reset_index()
-    district_map = nepal_gdf.merge(district_stats, on='district', how='left')
-    district_map['total_events'] = district_map['total_events'].fillna(0)
+def create_interactive_dashboard(events, nepal_gdf):
+    """Choropleth of event counts with event markers for an EventView."""
+    # Per-district statistics as arrays indexed by district ID
+    type_names = events.index.types
+    type_counts = district_crosstab(events.column('district_id'), events.column('type_code'), len(type_names))
+    total_events = type_counts.sum(axis=1)
+    common_disaster = np.full(N_DISTRICTS, None, dtype=object)
+    has_events = total_events > 0
+    if has_events.any():
+        common_disaster[has_events] = np.asarray(type_names, dtype=object)[type_counts[has_events].argmax(axis=1)]
+    shape_ids = nepal_gdf['district_id'].to_numpy()
+    district_map = nepal_gdf.assign(total_events=total_events[shape_ids], common_disaster=common_disaster[shape_ids])
     fig = px.choropleth_mapbox(
         district_map,
         geojson=district_map.geometry.__geo_interface__,
@@ -155,7 +177,7 @@ def create_interactive_dashboard(enhanced_gdf, nepal_gdf, year_range=None, disas
         height=650
     )
     marker_layer = px.scatter_mapbox(
-        filtered_df,
+        events.frame,
         lat='latitude',
         lon='longitude',
         color='disaster_type',
@@ -183,41 +205,45 @@ def create_interactive_dashboard(enhanced_gdf, nepal_gdf, year_range=None, disas
 
 def show_page():
     st.title("🌏 Nepal Extreme Events Atlas")
-    enhanced_gdf, nepal_gdf = load_and_enhance_data()
+    # Built once in the background and shared by every session; treat as read-only
+    atlas_job = get_scheduler().try_submit(("load_and_enhance_data",), load_and_enhance_data)
+    if not show_progress(atlas_job, "Preparing event atlas"):
+        poll([atlas_job])
+        return
+    if atlas_job.status == 'failed':
+        return
+    event_index, nepal_gdf = atlas_job.result
     with st.sidebar:
         st.header("Filter Options")
-        year_min = int(enhanced_gdf['year'].min())
-        year_max = int(enhanced_gdf['year'].max())
         year_range = st.slider(
             "Select Year Range",
-            min_value=year_min,
-            max_value=year_max,
-            value=(year_min, year_max)
+            min_value=event_index.year_min,
+            max_value=event_index.year_max,
+            value=(event_index.year_min, event_index.year_max)
         )
         disaster_types = st.multiselect(
             "Select Disaster Types",
-            options=enhanced_gdf['disaster_type'].unique(),
-            default=list(enhanced_gdf['disaster_type'].unique())[:5]
+            options=event_index.types,
+            default=[t for t in DEFAULT_DISASTER_TYPES if t in event_index.types]
         )
         st.header("Display Options")
         show_markers = st.checkbox("Show Event Markers", value=True)
         show_choropleth = st.checkbox("Show District Heatmap", value=True)
     st.header("Spatial-Temporal Event Analysis")
-    fig = create_interactive_dashboard(enhanced_gdf, nepal_gdf, year_range, disaster_types)
-    st.plotly_chart(fig, use_container_width=True)
-    filtered_df = enhanced_gdf[
-        (enhanced_gdf['year'] >= year_range[0]) & (enhanced_gdf['year'] <= year_range[1])
-    ]
-    if disaster_types:
-        filtered_df = filtered_df[filtered_df['disaster_type'].isin(disaster_types)]
+    # One query per rerun; every chart below reads from the same view
+    events = event_index.query(year_range, disaster_types)
+    fig = create_interactive_dashboard(events, nepal_gdf)
+    plotly_chart(fig, use_container_width=True)
+    filtered_df = events.frame
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Events", f"{len(filtered_df):,}")
+        st.metric("Total Events", f"{len(events):,}")
     with col2:
-        top_disaster = filtered_df['disaster_type'].value_counts().idxmax() if not filtered_df.empty else "N/A"
+        top_disaster = events.type_counts.idxmax() if not events.empty else "N/A"
         st.metric("Most Common Disaster", top_disaster)
     with col3:
-        affected_districts = filtered_df['district'].nunique()
+        event_counts = events.district_counts
+        affected_districts = np.count_nonzero(event_counts)
         st.metric("Affected Districts", f"{affected_districts} of {nepal_gdf.shape[0]}")
     col1, col2 = st.columns(2)
     with col1:
@@ -232,10 +258,9 @@ def show_page():
             markers=True,
             title="Events by Year"
         )
-        st.plotly_chart(fig_yearly, use_container_width=True)
+        plotly_chart(fig_yearly, use_container_width=True)
     with col2:
         st.subheader("Seasonal Distribution")
-        filtered_df['month_name'] = pd.to_datetime(filtered_df['start_date']).dt.strftime('%b')
         monthly_counts = filtered_df.groupby(['month', 'disaster_type']).size().reset_index(name='count')
         monthly_counts['month_name'] = pd.to_datetime(monthly_counts['month'], format='%m').dt.strftime('%b')
         fig_monthly = px.bar(
@@ -248,11 +273,35 @@ def show_page():
             category_orders={"month_name": ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
                                             'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']}
         )
-        st.plotly_chart(fig_monthly, use_container_width=True)
+        plotly_chart(fig_monthly, use_container_width=True)
+    st.subheader("Hotspot Analysis")
+    col1, col2 = st.columns(2)
+    with col1:
+        statistic = st.radio("Hotspot Statistic", ["Getis-Ord Gi*", "Local Moran's I"], horizontal=True)
+    with col2:
+        alpha = st.select_slider("Significance Level", options=[0.01, 0.05, 0.1], value=0.05)
+    # Recomputed from the filtered counts on every rerun; the contiguity weights are cached
+    weights = get_contiguity()
+    stats = local_statistics(event_counts, weights)
+    if statistic == "Getis-Ord Gi*":
+        labels, values, colors = classify_hotspots(stats, alpha), stats['gi_star'], HOTSPOT_COLORS
+        value_label = "Gi* z-score"
+    else:
+        labels, values, colors = classify_clusters(stats, alpha), stats['local_i'], CLUSTER_COLORS
+        value_label = "Local I"
+    fig_hotspots = hotspot_map_chart(
+        district_geojson(), weights.ids, district_names(weights.ids), labels[weights.ids],
+        values[weights.ids], value_label, colors,
+        f"{statistic} of Event Counts (p < {alpha}, {PERMUTATIONS} permutations)"
+    )
+    plotly_chart(fig_hotspots, use_container_width=True)
+    significant = labels[weights.ids] != list(colors)[-1]
+    st.caption(f"{np.count_nonzero(significant)} of {len(weights.ids)} districts are significant "
+               "at this level. Neighbours are districts that share a border.")
     st.subheader("Most Affected Districts")
-    district_counts = filtered_df['district'].value_counts().reset_index()
-    district_counts.columns = ['district', 'count']
-    district_counts = district_counts.sort_values('count', ascending=False).head(10)
+    top_ids = np.argsort(-event_counts, kind='stable')[:10]
+    top_ids = top_ids[event_counts[top_ids] > 0]
+    district_counts = pd.DataFrame({'district': district_names(top_ids), 'count': event_counts[top_ids].astype(int)})
     fig_district = px.bar(
         district_counts,
         x='district',
@@ -262,7 +311,7 @@ def show_page():
         title="Top 10 Districts by Event Count"
     )
     fig_district.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig_district, use_container_width=True)
+    plotly_chart(fig_district, use_container_width=True)
 
 if __name__ == "__main__":
     show_page()
@@ -0,0 +1,410 @@
+# app/query_service.py
+"""Headless HTTP query service over the dashboard's datasets.
+
+Serves district-year climate statistics, event counts and yield forecasts as
+JSON or Arrow without a Streamlit process. Each endpoint reads from a rollup
+that is computed once per version of its source files; rendered responses are
+kept in an in-memory LRU cache and carry ETag and Last-Modified headers, so
+repeated and conditional requests cost a dictionary lookup. Run from the
+repository root:
+
+    python app/query_service.py serve --port 8600
+    python app/query_service.py bench --url http://127.0.0.1:8600 --requests 2000
+
+Endpoints (all GET; ``format=json|arrow`` or an Arrow ``Accept`` header):
+
+    /districts
+    /climate/yearly?district=Kaski,Jumla&start=2000&end=2010
+    /events/counts?disaster_type=Flood&start=2000&end=2019
+    /yields/forecast?district=Kaski&start=2024&end=2026&model=XGBoost
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from climate_data import CLIMATE_DATA_PATH, load_climate_data  # noqa: E402
+from districts import COORDINATES_PATH, DISTRICTS, district_ids, load_district_coordinates  # noqa: E402
+from events_data import EVENTS_PATH, clean_events, load_events  # noqa: E402
+from shared_data import source_fingerprint  # noqa: E402
+from tuning import load_tuned_params, tuned_params_path  # noqa: E402
+from yield_models import AGRICULTURE_PATH, build_features, forecast_yields, load_agriculture, train_models  # noqa: E402
+
+MAX_CACHED_RESPONSES = 512
+YIELD_HORIZON = 10
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class QueryError(ValueError):
+    """Bad query parameters; reported to the client as 400."""
+
+
+def _districts_rollup():
+    coordinates = load_district_coordinates()
+    return pd.DataFrame({"district_id": np.arange(len(DISTRICTS), dtype=np.int16), "district": DISTRICTS,
+                         "latitude": coordinates[:, 0], "longitude": coordinates[:, 1]})
+
+
+def _climate_rollup():
+    df = load_climate_data(CLIMATE_DATA_PATH)
+    yearly = df.groupby(["district_id", "year"]).agg(
+        t2m_mean=("t2m", "mean"), t2m_min=("t2m", "min"), t2m_max=("t2m", "max"),
+        prectot_mean=("prectot", "mean"), prectot_max=("prectot", "max"), months=("t2m", "size")
+    ).reset_index()
+    yearly.insert(1, "district", np.asarray(DISTRICTS, dtype=object)[yearly["district_id"]])
+    return yearly
+
+
+def _events_rollup():
+    events = clean_events(load_events())
+    counts = events.groupby(["year", "disaster_type"]).size().rename("events").reset_index()
+    return counts.sort_values(["year", "disaster_type"], ignore_index=True)
+
+
+def _yields_rollup():
+    df = load_agriculture()
+    X, y = build_features(df)
+    results, _, _ = train_models(X, y, params=load_tuned_params(X, y))
+    last_year = int(df["year"].max())
+    forecast = forecast_yields(df, results, X.columns, np.arange(last_year + 1, last_year + YIELD_HORIZON + 1))
+    forecast = forecast.rename(columns={"DISTRICT_NAME": "district", "VG_A": "area_ha", "VG_Y": "predicted_yield"})
+    forecast["rmse"] = forecast["model"].map({name: result["rmse"] for name, result in results.items()})
+    forecast["best"] = forecast["rmse"] == forecast["rmse"].min()
+    return forecast[["district_id", "district", "year", "model", "best", "rmse", "area_ha", "predicted_yield"]]
+
+
+_tuning_result = (None, None)
+
+
+def _tuning_result_path():
+    """Tuning result file for the current yield table, recomputed only when the table changes."""
+    global _tuning_result
+    version = source_fingerprint([AGRICULTURE_PATH])
+    if _tuning_result[0] != version:
+        X, y = build_features(load_agriculture())
+        _tuning_result = (version, tuned_params_path(X, y))
+    return _tuning_result[1]
+
+
+class Rollup:
+    """A precomputed table, rebuilt only when one of its source files changes.
+
+    A source may also be a function returning a path, for files whose location
+    depends on the data; sources that do not exist (yet) are skipped, so
+    creating one also counts as a change.
+    """
+
+    def __init__(self, name, sources, build):
+        self.name = name
+        self.sources = sources
+        self.build = build
+        self._state = (None, None, None)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """(frame, version, last-modified timestamp) of the current rollup."""
+        sources = [source() if callable(source) else source for source in self.sources]
+        sources = [path for path in sources if os.path.exists(path)]
+        version = source_fingerprint(sources)
+        if version != self._state[1]:
+            with self._lock:
+                if version != self._state[1]:
+                    last_modified = int(max(os.stat(path).st_mtime for path in sources))
+                    self._state = (self.build(), version, last_modified)
+        return self._state
+
+
+def _year_range(params):
+    try:
+        start = int(params["start"][0]) if "start" in params else None
+        end = int(params["end"][0]) if "end" in params else None
+    except ValueError as exc:
+        raise QueryError("start and end must be years") from exc
+    return start, end
+
+
+def _district_mask(frame, params):
+    names = [name for value in params.get("district", []) for name in value.split(",") if name]
+    if not names:
+        return np.ones(len(frame), dtype=bool)
+    try:
+        ids = district_ids(names)
+    except KeyError as exc:
+        raise QueryError(exc.args[0]) from exc
+    return np.isin(frame["district_id"].to_numpy(), ids)
+
+
+def _year_mask(frame, params):
+    start, end = _year_range(params)
+    years = frame["year"].to_numpy()
+    mask = np.ones(len(frame), dtype=bool)
+    if start is not None:
+        mask &= years >= start
+    if end is not None:
+        mask &= years <= end
+    return mask
+
+
+def query_districts(frame, params):
+    return frame[_district_mask(frame, params)]
+
+
+def query_climate(frame, params):
+    return frame[_district_mask(frame, params) & _year_mask(frame, params)]
+
+
+def query_events(frame, params):
+    mask = _year_mask(frame, params)
+    types = [t for value in params.get("disaster_type", []) for t in value.split(",") if t]
+    if types:
+        mask &= frame["disaster_type"].isin(types).to_numpy()
+    return frame[mask]
+
+
+def query_yields(frame, params):
+    mask = _district_mask(frame, params) & _year_mask(frame, params)
+    model = params.get("model", [None])[0]
+    if model is None:
+        mask &= frame["best"].to_numpy()
+    elif model != "all":
+        if model not in set(frame["model"]):
+            raise QueryError(f"Unknown model {model!r}")
+        mask &= (frame["model"] == model).to_numpy()
+    return frame[mask]
+
+
+ENDPOINTS = {
+    "/districts": (Rollup("districts", [COORDINATES_PATH], _districts_rollup), query_districts),
+    "/climate/yearly": (Rollup("climate", [CLIMATE_DATA_PATH], _climate_rollup), query_climate),
+    "/events/counts": (Rollup("events", [EVENTS_PATH], _events_rollup), query_events),
+    "/yields/forecast": (Rollup("yields", [AGRICULTURE_PATH, _tuning_result_path], _yields_rollup), query_yields),
+}
+
+
+def encode(frame, fmt):
+    """Serialize a result table as JSON records or an Arrow IPC stream."""
+    if fmt == "arrow":
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_TYPE
+    return frame.to_json(orient="records", date_format="iso").encode(), "application/json"
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered response bodies."""
+
+    def __init__(self, max_entries=MAX_CACHED_RESPONSES):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+def _canonical_query(params):
+    return tuple(sorted((key, tuple(values)) for key, values in params.items() if key != "format"))
+
+
+def _response_format(params, accept):
+    fmt = params.get("format", [None])[0]
+    if fmt is None:
+        fmt = "arrow" if ARROW_TYPE in (accept or "") else "json"
+    if fmt not in ("json", "arrow"):
+        raise QueryError(f"Unsupported format {fmt!r}")
+    return fmt
+
+
+def _not_modified(headers, etag, last_modified):
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= last_modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server_version = "AgriQuery/1.0"
+    protocol_version = "HTTP/1.1"
+    cache = ResponseCache()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = ENDPOINTS.get(url.path.rstrip("/") or "/")
+        if endpoint is None:
+            return self._send_error(404, f"Unknown endpoint {url.path}; try one of {', '.join(ENDPOINTS)}")
+        rollup, query = endpoint
+        params = parse_qs(url.query)
+        try:
+            fmt = _response_format(params, self.headers.get("Accept"))
+            frame, version, last_modified = rollup.get()
+            key = (url.path, version, _canonical_query(params), fmt)
+            entry = self.cache.get(key)
+            if entry is None:
+                body, content_type = encode(query(frame, params), fmt)
+                etag = '"%s"' % hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+                entry = (body, content_type, etag, last_modified)
+                self.cache.put(key, entry)
+        except QueryError as exc:
+            return self._send_error(400, str(exc))
+        except Exception as exc:  # a broken rollup must not take the server down
+            return self._send_error(500, repr(exc))
+
+        body, content_type, etag, last_modified = entry
+        headers = {"ETag": etag, "Last-Modified": formatdate(last_modified, usegmt=True),
+                   "Cache-Control": "no-cache"}
+        if _not_modified(self.headers, etag, last_modified):
+            return self._send(304, headers)
+        self._send(200, {**headers, "Content-Type": content_type}, body)
+
+    def _send(self, status, headers, body=b""):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, {"Content-Type": "application/json"}, json.dumps({"error": message}).encode())
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(host="127.0.0.1", port=8600, warm=True, verbose=False):
+    """Run the service until interrupted; ``warm`` builds every rollup before accepting requests."""
+    if warm:
+        for path, (rollup, _) in ENDPOINTS.items():
+            start = time.perf_counter()
+            frame, _, _ = rollup.get()
+            print(f"{path}: {len(frame)} rows in {time.perf_counter() - start:.1f}s")
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    print(f"Serving on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+BENCH_QUERIES = [
+    "/districts",
+    "/climate/yearly?district=Kaski,Kathmandu&start=2000",
+    "/climate/yearly?format=arrow",
+    "/events/counts?start=2000&end=2019",
+    "/yields/forecast?district=Kaski",
+    "/yields/forecast?model=all&format=arrow",
+]
+
+
+def _fetch(url, headers=None):
+    start = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers or {})) as response:
+            body = response.read()
+            status, etag = response.status, response.headers.get("ETag")
+    except HTTPError as exc:  # 304 and errors arrive as exceptions
+        body, status, etag = exc.read(), exc.code, exc.headers.get("ETag")
+    return time.perf_counter() - start, status, len(body), etag
+
+
+def benchmark(base_url, queries=BENCH_QUERIES, requests=2000, concurrency=8):
+    """Latency of first, repeated and conditional (If-None-Match) requests."""
+    first = {query: _fetch(base_url + query) for query in queries}
+    etags = {query: result[3] for query, result in first.items()}
+    results = {"first_request_s": {query: result[0] for query, result in first.items()},
+               "bytes": {query: result[2] for query, result in first.items()}}
+
+    def run(conditional):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            samples = list(executor.map(
+                lambda i: _fetch(base_url + queries[i % len(queries)],
+                                 {"If-None-Match": etags[queries[i % len(queries)]]} if conditional else None),
+                range(requests)
+            ))
+            wall_time = time.perf_counter() - start
+        latencies = np.array([s[0] for s in samples])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {"requests_per_s": requests / wall_time, "latency_p50_s": p50, "latency_p95_s": p95,
+                "latency_p99_s": p99, "statuses": sorted({s[1] for s in samples})}
+
+    results["repeated"] = run(conditional=False)
+    results["conditional"] = run(conditional=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless query service for the dashboard datasets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the HTTP service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8600)
+    serve_parser.add_argument("--no-warm", action="store_true", help="build rollups on first request instead")
+    serve_parser.add_argument("--verbose", action="store_true", help="log every request")
+    bench_parser = commands.add_parser("bench", help="benchmark a running service")
+    bench_parser.add_argument("--url", default="http://127.0.0.1:8600")
+    bench_parser.add_argument("--requests", type=int, default=2000)
+    bench_parser.add_argument("--concurrency", type=int, default=8)
+    bench_parser.add_argument("--output", default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, warm=not args.no_warm, verbose=args.verbose)
+    else:
+        results = benchmark(args.url.rstrip("/"), requests=args.requests, concurrency=args.concurrency)
+        print(json.dumps(results, indent=2, default=float))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2, default=float)
+
+
+if __name__ == "__main__":
+    main()
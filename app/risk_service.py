@@ -0,0 +1,197 @@
+# app/risk_service.py
+import os
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import classification_report
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from cache_utils import cache_path, frame_fingerprint
+from jobs import get_scheduler, report_progress
+
+FEATURES = ['latitude', 'longitude', 'year', 'month']
+
+# Grid covering Nepal on which the risk cube is evaluated
+RISK_GRID = {
+    'min_lat': 26.3, 'max_lat': 30.5,
+    'min_lon': 80.0, 'max_lon': 88.2,
+    'step': 0.1
+}
+
+
+def prepare_features(df):
+    """Feature engineering for ML model"""
+    # Encode disaster types
+    le = LabelEncoder()
+    df = df.assign(disaster_encoded=le.fit_transform(df['disaster_type']))
+
+    target = 'disaster_encoded'
+
+    return df[FEATURES], df[target], le
+
+
+def train_model(X, y):
+    """Train Random Forest classifier"""
+    # Stratify only when every class has enough members to appear on both sides
+    stratify = y if y.value_counts().min() >= 2 else None
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=stratify
+    )
+
+    model = RandomForestClassifier(n_estimators=100, class_weight='balanced', random_state=42)
+    model.fit(X_train, y_train)
+
+    return model, X_test, y_test
+
+
+class RiskCube:
+    """Class probabilities precomputed on a lat/lon grid for each calendar month.
+
+    ``probs`` has shape (n_lat, n_lon, 12, n_classes), so any lookup is a
+    constant-time index into the array.
+    """
+
+    def __init__(self, lats, lons, classes, probs, year):
+        self.lats = lats
+        self.lons = lons
+        self.classes = list(classes)
+        self.probs = probs
+        self.year = year
+        self.step = float(lats[1] - lats[0])
+
+    def _index(self, lat, lon, month):
+        i = np.clip(np.rint((np.asarray(lat) - self.lats[0]) / self.step).astype(int), 0, len(self.lats) - 1)
+        j = np.clip(np.rint((np.asarray(lon) - self.lons[0]) / self.step).astype(int), 0, len(self.lons) - 1)
+        m = np.clip(np.asarray(month).astype(int), 1, 12) - 1
+        return i, j, m
+
+    def lookup(self, lat, lon, month):
+        """Disaster-type probabilities for one location and month, most likely first."""
+        i, j, m = self._index(lat, lon, month)
+        risk = pd.Series(self.probs[i, j, m], index=self.classes, name='probability')
+        return risk.sort_values(ascending=False)
+
+    def lookup_many(self, lats, lons, months):
+        """Vectorised lookup; returns an (n, n_classes) DataFrame."""
+        i, j, m = self._index(lats, lons, months)
+        return pd.DataFrame(self.probs[i, j, m], columns=self.classes)
+
+    def surface(self, month, disaster_type):
+        """Long-format grid of one disaster type's probability for a month."""
+        k = self.classes.index(disaster_type)
+        lat_grid, lon_grid = np.meshgrid(self.lats, self.lons, indexing='ij')
+        return pd.DataFrame({
+            'latitude': lat_grid.ravel(),
+            'longitude': lon_grid.ravel(),
+            'probability': self.probs[:, :, month - 1, k].ravel()
+        })
+
+
+def build_risk_cube(model, classes, year, grid=RISK_GRID):
+    """Evaluate the classifier on every grid cell and month in a single predict_proba call."""
+    step = grid['step']
+    lats = np.round(np.arange(grid['min_lat'], grid['max_lat'] + step / 2, step), 6)
+    lons = np.round(np.arange(grid['min_lon'], grid['max_lon'] + step / 2, step), 6)
+    months = np.arange(1, 13)
+
+    lat_grid, lon_grid, month_grid = np.meshgrid(lats, lons, months, indexing='ij')
+    X = pd.DataFrame({
+        'latitude': lat_grid.ravel(),
+        'longitude': lon_grid.ravel(),
+        'year': year,
+        'month': month_grid.ravel()
+    })[FEATURES]
+
+    # Classes absent from the training split get zero probability
+    probs = np.zeros((X.shape[0], len(classes)), dtype=np.float32)
+    probs[:, model.classes_] = model.predict_proba(X)
+    probs = probs.reshape(len(lats), len(lons), len(months), len(classes))
+    return RiskCube(lats, lons, classes, probs, year)
+
+
+def _build_cube(events, year, key):
+    """Train the classifier and evaluate the cube, or load both from the disk cache."""
+    path = cache_path(f"risk_cube-{key}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path)
+    report_progress(0.1, "Training classifier")
+    X, y, le = prepare_features(events)
+    model, X_test, y_test = train_model(X, y)
+    y_pred = model.predict(X_test)
+    report = classification_report(
+        y_test, y_pred, labels=np.arange(len(le.classes_)),
+        target_names=le.classes_, output_dict=True, zero_division=0
+    )
+    report_progress(0.6, "Evaluating risk grid")
+    cube = build_risk_cube(model, le.classes_, year)
+    joblib.dump((cube, report), path)
+    return cube, report
+
+
+class RiskService:
+    """Trains the disaster-type classifier once in the background job scheduler
+    and serves risk lookups from the precomputed cube.
+    """
+
+    _STATUS = {'busy': 'busy', 'queued': 'training', 'running': 'training', 'done': 'ready', 'failed': 'failed'}
+
+    def __init__(self):
+        self._job = None
+
+    def start(self, events, year=None):
+        """Begin training on ``events`` unless the same data is already being served."""
+        year = int(events['year'].max()) if year is None else int(year)
+        key = frame_fingerprint(events[FEATURES + ['disaster_type']], year, RISK_GRID)
+        self._job = get_scheduler().try_submit(("risk_cube", key), _build_cube, events, year, key)
+        return self.status
+
+    @property
+    def job(self):
+        return self._job
+
+    @property
+    def status(self):
+        return 'idle' if self._job is None else self._STATUS[self._job.status]
+
+    @property
+    def error(self):
+        return None if self._job is None else self._job.error
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    @property
+    def cube(self):
+        return self._job.result[0] if self.ready else None
+
+    @property
+    def report(self):
+        return self._job.result[1] if self.ready else None
+
+    def wait(self, timeout=None):
+        if self._job is not None:
+            self._job.wait(timeout)
+        return self.ready
+
+    def lookup(self, lat, lon, month):
+        if not self.ready:
+            raise RuntimeError(f"Risk model is not ready (status: {self.status})")
+        return self.cube.lookup(lat, lon, month)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_risk_service():
+    """Process-wide RiskService shared by every session."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RiskService()
+        return _service
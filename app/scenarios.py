@@ -0,0 +1,152 @@
+# app/scenarios.py
+"""Monte Carlo climate scenarios for district crop yields.
+
+The yield models are retrained with two climate inputs per district and
+year, monsoon rainfall and mean temperature, from the monthly climate table.
+A scenario run then draws, for every district, thousands of climate years
+from that district's own history and applies the requested change (say 20%
+less monsoon rainfall). Each draw is predicted twice, as drawn and as
+perturbed, and the results are reduced to distributions of yield and of
+yield change.
+
+Districts are split across worker processes. Each worker builds the feature
+matrix for its districts in one block and predicts it with one call per
+model. Random draws come from one generator per district, so results do not
+depend on the number of workers.
+"""
+import numpy as np
+import pandas as pd
+
+from jobs import process_pool, report_progress
+from yield_models import FEATURES, TARGET, train_models
+
+CLIMATE_FEATURES = ['monsoon_prectot', 't2m_mean']
+N_SCENARIOS = 2000
+
+_models = None
+_columns = None
+_history = None
+_base = None
+
+
+def yearly_climate(climate):
+    """Monsoon rainfall total and annual mean temperature per district and year."""
+    monsoon = climate[climate['season'] == 'Monsoon'].groupby(['district_id', 'year'])['prectot'].sum()
+    temperature = climate.groupby(['district_id', 'year'])['t2m'].mean()
+    return pd.DataFrame({'monsoon_prectot': monsoon, 't2m_mean': temperature}).dropna().reset_index()
+
+
+def build_climate_features(df, yearly):
+    """Yield model inputs plus climate features, for district-years with climate data."""
+    merged = df.merge(yearly, on=['district_id', 'year'], how='inner')
+    features = merged[FEATURES + CLIMATE_FEATURES].dropna()
+    target = merged.loc[features.index, TARGET]
+    return pd.get_dummies(features, columns=['DISTRICT_NAME']), target
+
+
+def train_scenario_models(df, yearly, params=None):
+    """The yield models of ``train_models``, trained with the climate features."""
+    X, y = build_climate_features(df, yearly)
+    return train_models(X, y, params)
+
+
+def build_scenario_models(df, climate, params=None):
+    """Yearly climate features and the climate-aware models trained on them.
+
+    Returns (yearly climate, training results, model input columns).
+    """
+    yearly = yearly_climate(climate)
+    results, X_test, _ = train_scenario_models(df, yearly, params)
+    return yearly, results, list(X_test.columns)
+
+
+def _init_worker(models, columns, history, base):
+    global _models, _columns, _history, _base
+    for model in models.values():
+        if 'n_jobs' in model.get_params():
+            model.set_params(n_jobs=1)
+    _models, _columns, _history, _base = models, columns, history, base
+
+
+def _simulate(task):
+    """Baseline and perturbed predictions for a block of districts.
+
+    Returns {model name: (baseline, scenario)}, each of shape (districts, n).
+    """
+    positions, seeds, year, rain_change, temperature_change, n = task
+    column = {name: i for i, name in enumerate(_columns)}
+    rows = len(positions) * n
+    X = np.zeros((2 * rows, len(_columns)), dtype=np.float32)
+    for i, (position, seed) in enumerate(zip(positions, seeds)):
+        block = slice(i * n, (i + 1) * n)
+        history = _history[position]
+        draws = history[np.random.default_rng(seed).integers(0, len(history), n)]
+        X[block, column['DISTRICT_NAME_' + _base['DISTRICT_NAME'][position]]] = 1
+        X[block, column['VG_A']] = _base['VG_A'][position]
+        X[block, column['monsoon_prectot']] = draws[:, 0]
+        X[block, column['t2m_mean']] = draws[:, 1]
+    X[:, column['year']] = year
+    X[rows:] = X[:rows]
+    X[rows:, column['monsoon_prectot']] *= 1 + rain_change
+    X[rows:, column['t2m_mean']] += temperature_change
+
+    X = pd.DataFrame(X, columns=_columns)
+    predictions = {}
+    for name, model in _models.items():
+        predicted = model.predict(X).reshape(2, len(positions), n)
+        predictions[name] = (predicted[0], predicted[1])
+    return predictions
+
+
+def run_scenarios(df, yearly, results, columns, year, rain_change=0.0, temperature_change=0.0,
+                  n_scenarios=N_SCENARIOS, seed=0, workers=None):
+    """Distribution of predicted yields for every district under a climate change scenario.
+
+    ``yearly``, ``results`` and ``columns`` come from ``build_scenario_models``;
+    ``rain_change`` is the relative change of monsoon rainfall (-0.2 for 20%
+    less) and ``temperature_change`` is added to the annual mean temperature
+    in °C. Each district keeps the cultivated area of its latest recorded
+    year. Returns a long DataFrame with one row per district and model.
+    """
+    latest = df.dropna(subset=['VG_A']).sort_values('year').groupby('district_id').tail(1)
+    base = latest[latest['district_id'].isin(yearly['district_id'])].sort_values('district_id')
+    base = base[['district_id', 'DISTRICT_NAME', 'VG_A']].reset_index(drop=True)
+    by_district = yearly.sort_values('year').groupby('district_id')
+    history = [by_district.get_group(i)[CLIMATE_FEATURES].to_numpy(np.float64) for i in base['district_id']]
+
+    models = {name: result['model'] for name, result in results.items()}
+    seeds = np.random.SeedSequence(seed).spawn(len(base))
+    blocks = np.array_split(np.arange(len(base)), min(len(base), 16))
+    tasks = [(block, [seeds[i] for i in block], year, rain_change, temperature_change, n_scenarios)
+             for block in blocks]
+    baseline = {name: [] for name in models}
+    scenario = {name: [] for name in models}
+    report_progress(0.0, f"Simulating {n_scenarios:,} scenarios for {len(base)} districts")
+    executor = process_pool(max_workers=workers, initializer=_init_worker,
+                            initargs=(models, list(columns), history,
+                                      base[['DISTRICT_NAME', 'VG_A']].to_dict('list')))
+    try:
+        for i, predictions in enumerate(executor.map(_simulate, tasks)):
+            for name, (before, after) in predictions.items():
+                baseline[name].append(before)
+                scenario[name].append(after)
+            report_progress((i + 1) / len(tasks), f"Simulated {i + 1} of {len(tasks)} district blocks")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    summaries = []
+    for name in models:
+        before, after = np.concatenate(baseline[name]), np.concatenate(scenario[name])
+        change = after - before
+        summaries.append(base.assign(
+            model=name,
+            baseline_mean=before.mean(axis=1),
+            scenario_mean=after.mean(axis=1),
+            scenario_p05=np.percentile(after, 5, axis=1),
+            scenario_p95=np.percentile(after, 95, axis=1),
+            change_mean=change.mean(axis=1),
+            change_p05=np.percentile(change, 5, axis=1),
+            change_p95=np.percentile(change, 95, axis=1),
+            prob_decline=(change < 0).mean(axis=1)
+        ))
+    return pd.concat(summaries, ignore_index=True)
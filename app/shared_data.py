@@ -0,0 +1,133 @@
+# app/shared_data.py
+"""Read-only datasets shared by every session of the server process.
+
+Each dataset is built once, persisted column by column as ``.npy`` files and
+memory-mapped back, so numeric and datetime columns live in the OS page cache
+(shared even between server processes) instead of in per-session copies.
+String columns are decoded from their codes once per process. Callers receive
+shallow views whose arrays are all read-only: replacing a column only changes
+the caller's view, and writing into shared values raises instead of changing
+them for every session.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import cache_path
+
+_MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+_frames = {}
+_lock = threading.RLock()  # a build may load other shared datasets
+
+
+def source_fingerprint(sources, version=1):
+    """Short hash of the paths, sizes and modification times of ``sources``."""
+    digest = hashlib.sha1(str(version).encode())
+    for path in sources:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _write_columns(df, directory):
+    """Persist each column as an .npy file plus a JSON description of how to rebuild it."""
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        entry = {"name": name, "file": f"{i}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(series.dtype):
+            if pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty"):
+                raise TypeError(f"Column {name!r} mixes strings with other objects")
+            codes, uniques = pd.factorize(series)
+            entry.update(kind="strings", categories=list(uniques))
+            data = codes.astype(np.int32)
+        elif isinstance(series.array, _MASKED_ARRAYS):
+            # Nullable integer/float/boolean: values and mask are stored separately
+            entry.update(kind="masked", dtype=str(series.dtype), mask=f"{i}.mask.npy")
+            np.save(os.path.join(directory, entry["mask"]), series.array.isna())
+            numpy_dtype = series.dtype.numpy_dtype
+            data = series.to_numpy(dtype=numpy_dtype, na_value=np.zeros(1, dtype=numpy_dtype)[0])
+        elif pd.api.types.is_datetime64_dtype(series.dtype):
+            entry.update(kind="datetime", dtype=str(series.dtype))
+            data = series.to_numpy().view("i8")
+        elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            entry.update(kind="numpy")
+            data = series.to_numpy()
+        else:
+            raise TypeError(f"Column {name!r} has unsupported dtype {series.dtype}")
+        np.save(os.path.join(directory, entry["file"]), np.ascontiguousarray(data))
+        columns.append(entry)
+    with open(os.path.join(directory, "columns.json"), "w") as f:
+        json.dump(columns, f)
+
+
+def _read_columns(directory):
+    """Memory-map the persisted columns back into a DataFrame without copying them."""
+    with open(os.path.join(directory, "columns.json")) as f:
+        columns = json.load(f)
+    arrays = {}
+    for entry in columns:
+        data = np.load(os.path.join(directory, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "strings":
+            # Code -1 (missing) picks the trailing NaN
+            categories = np.array(entry["categories"] + [np.nan], dtype=object)
+            values = categories[data]
+            values.flags.writeable = False
+            arrays[entry["name"]] = values
+        elif entry["kind"] == "masked":
+            mask = np.load(os.path.join(directory, entry["mask"]), mmap_mode="r")
+            array_type = pd.api.types.pandas_dtype(entry["dtype"]).construct_array_type()
+            arrays[entry["name"]] = array_type(data, mask)
+        elif entry["kind"] == "datetime":
+            arrays[entry["name"]] = data.view(entry["dtype"])
+        else:
+            arrays[entry["name"]] = data
+    return pd.DataFrame(arrays, copy=False)
+
+
+def shared_frame(name, sources, build, version=1, persist=True):
+    """Return a view of dataset ``name``, building it with ``build()`` at most once per process.
+
+    ``sources`` are the files the dataset is derived from; changing any of them
+    (or ``version``) rebuilds it. With ``persist=False`` the built object is only
+    kept in memory, which is what GeoDataFrames need since shapely geometries
+    cannot be memory-mapped; such datasets are small and every caller gets its
+    own copy.
+    """
+    key = f"{name}-{source_fingerprint(sources, version)}"
+    with _lock:
+        frame = _frames.get(key)
+        if frame is None:
+            frame = _load_or_build(key, build, persist)
+            # Drop stale versions of the same dataset
+            for stale in [k for k in _frames if k.startswith(f"{name}-")]:
+                del _frames[stale]
+            _frames[key] = frame
+    return frame.copy(deep=not persist)
+
+
+def _load_or_build(key, build, persist):
+    if not persist:
+        return build()
+    directory = cache_path(os.path.join("shared", key))
+    if not os.path.exists(os.path.join(directory, "columns.json")):
+        df = build().reset_index(drop=True)
+        tmp_dir = f"{directory}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        try:
+            _write_columns(df, tmp_dir)
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Another process published the same dataset first
+            if not os.path.exists(os.path.join(directory, "columns.json")):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return _read_columns(directory)
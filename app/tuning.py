@@ -0,0 +1,290 @@
+# app/tuning.py
+"""Successive-halving hyperparameter search for the crop yield models.
+
+Every (model, configuration, fold, budget) evaluation is written to the cache
+as soon as it finishes, so an interrupted or repeated search resumes where it
+stopped. The time budget is a hard limit: evaluations check the deadline
+between boosting rounds or batches of trees and are abandoned once it passes.
+XGBoost early-stops on an inner split of each training fold, so the
+validation fold that scores a configuration is never used to pick its number
+of rounds. Run from the repository root:
+
+    python app/tuning.py --budget 600 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import KFold, ParameterSampler, train_test_split
+from xgboost import XGBRegressor
+from xgboost.callback import TrainingCallback
+
+from cache_utils import cache_path, frame_fingerprint
+from jobs import process_pool
+from yield_models import build_features, load_agriculture_data
+
+SEARCH_SPACES = {
+    "Random Forest": {
+        "max_depth": [None, 6, 10, 16],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": [1.0, 0.5, "sqrt"]
+    },
+    "XGBoost": {
+        "max_depth": [3, 4, 6, 8],
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+        "subsample": [0.7, 0.85, 1.0],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "min_child_weight": [1, 3, 5],
+        "reg_lambda": [0.5, 1.0, 5.0]
+    }
+}
+
+# Budget per rung, from the first rung to the cap: number of trees for the
+# Random Forest, maximum boosting rounds (early stopped) for XGBoost.
+RESOURCES = {"Random Forest": (25, 400), "XGBoost": (50, 1200)}
+ETA = 3
+N_CANDIDATES = 27
+N_SPLITS = 3
+EARLY_STOPPING_ROUNDS = 30
+EARLY_STOPPING_FRACTION = 0.15
+# Bumped when evaluations change, so cached fold scores of older runs are not reused
+VERSION = 2
+
+_X = None
+_y = None
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+
+class _Deadline(TrainingCallback):
+    """Stop boosting once the wall-clock ``deadline`` has passed."""
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+        self.expired = False
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.expired = time.time() > self.deadline
+        return self.expired
+
+
+def _config_key(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:10]
+
+
+def _result_path(run_dir, name, config, fold, resource):
+    slug = name.lower().replace(" ", "_")
+    return os.path.join(run_dir, f"{slug}-{_config_key(config)}-f{fold}-r{resource}.json")
+
+
+def _evaluate(run_dir, name, config, fold, resource, train_idx, val_idx, deadline):
+    """Fit one configuration on one fold and persist its validation score.
+
+    Returns None, and persists nothing, when ``deadline`` (a ``time.time()``
+    value) passes before the fit is complete.
+    """
+    X_val, y_val = _X[val_idx], _y[val_idx]
+
+    if name == "XGBoost":
+        fit_idx, stop_idx = train_test_split(train_idx, test_size=EARLY_STOPPING_FRACTION, random_state=fold)
+        stop = _Deadline(deadline)
+        model = XGBRegressor(
+            n_estimators=resource, early_stopping_rounds=EARLY_STOPPING_ROUNDS, callbacks=[stop],
+            tree_method="hist", n_jobs=1, random_state=42, **config
+        )
+        model.fit(_X[fit_idx], _y[fit_idx], eval_set=[(_X[stop_idx], _y[stop_idx])], verbose=False)
+        if stop.expired:
+            return None
+        best_iteration = int(model.best_iteration)
+        preds = model.predict(X_val, iteration_range=(0, best_iteration + 1))
+    else:
+        # Grown in batches of the first rung's size (the same forest as one fit) to check the deadline
+        model = RandomForestRegressor(n_estimators=0, warm_start=True, n_jobs=1, random_state=42, **config)
+        while model.n_estimators < resource:
+            if time.time() > deadline:
+                return None
+            model.set_params(n_estimators=min(model.n_estimators + RESOURCES[name][0], resource))
+            model.fit(_X[train_idx], _y[train_idx])
+        best_iteration = resource - 1
+        preds = model.predict(X_val)
+
+    result = {"rmse": float(mean_squared_error(y_val, preds) ** 0.5), "best_iteration": best_iteration}
+    path = _result_path(run_dir, name, config, fold, resource)
+    with open(path + ".tmp", "w") as f:
+        json.dump(result, f)
+    os.replace(path + ".tmp", path)
+    return result
+
+
+def _rungs(name):
+    low, high = RESOURCES[name]
+    rungs = [low]
+    while rungs[-1] < high:
+        rungs.append(min(rungs[-1] * ETA, high))
+    return rungs
+
+
+def _load_result(run_dir, name, config, fold, resource):
+    path = _result_path(run_dir, name, config, fold, resource)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+class _HalvingState:
+    """Survivors and scores of one model family's successive-halving bracket."""
+
+    def __init__(self, name, n_candidates, random_state):
+        self.name = name
+        self.rungs = _rungs(name)
+        self.rung = 0
+        self.survivors = list(ParameterSampler(SEARCH_SPACES[name], n_candidates, random_state=random_state))
+        self.best = None
+
+    @property
+    def done(self):
+        return self.rung >= len(self.rungs) or not self.survivors
+
+    @property
+    def resource(self):
+        return self.rungs[self.rung]
+
+    def promote(self, scores):
+        """Record the completed rung and keep the top 1/ETA configurations."""
+        ranked = sorted(scores, key=lambda item: item[1]["rmse"])
+        config, summary = ranked[0]
+        self.best = {"params": self._final_params(config, summary), "rmse": summary["rmse"],
+                     "resource": self.resource, "candidates": len(ranked)}
+        keep = max(1, len(ranked) // ETA)
+        self.survivors = [config for config, _ in ranked[:keep]]
+        self.rung += 1
+
+    def _final_params(self, config, summary):
+        params = dict(config)
+        if self.name == "XGBoost":
+            params["n_estimators"] = summary["n_estimators"]
+        else:
+            params["n_estimators"] = self.resource
+        return params
+
+
+def tune(X, y, budget=600, workers=None, n_candidates=N_CANDIDATES, random_state=42):
+    """Search every model family within ``budget`` seconds and return the best configurations.
+
+    Tuning only sees the training split used by ``train_models``, so the test
+    metrics shown on the page stay honest.
+    """
+    # Wall-clock time, since the deadline is also checked in the worker processes
+    deadline = time.time() + budget
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    run_dir = tuning_dir(X, y, random_state)
+    os.makedirs(run_dir, exist_ok=True)
+
+    X_arr = np.asarray(X_train, dtype=np.float32)
+    y_arr = np.asarray(y_train, dtype=np.float32)
+    folds = list(KFold(n_splits=N_SPLITS, shuffle=True, random_state=random_state).split(X_arr))
+    states = [_HalvingState(name, n_candidates, random_state) for name in SEARCH_SPACES]
+
+    # The search runs on its own, so it takes every CPU unless told otherwise
+    executor = process_pool(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                            initargs=(X_arr, y_arr))
+    try:
+        while any(not state.done for state in states) and time.time() < deadline:
+            pending = {}
+            results = {}
+            for state in states:
+                if state.done:
+                    continue
+                for config in state.survivors:
+                    for fold, (train_idx, val_idx) in enumerate(folds):
+                        key = (state.name, _config_key(config), fold)
+                        cached = _load_result(run_dir, state.name, config, fold, state.resource)
+                        if cached is not None:
+                            results[key] = cached
+                        else:
+                            future = executor.submit(_evaluate, run_dir, state.name, config, fold,
+                                                     state.resource, train_idx, val_idx, deadline)
+                            pending[future] = key
+
+            out_of_time = False
+            while pending and not out_of_time:
+                finished, _ = wait(pending, timeout=max(deadline - time.time(), 0),
+                                   return_when=FIRST_COMPLETED)
+                out_of_time = not finished
+                for future in finished:
+                    key = pending.pop(future)
+                    result = future.result()
+                    if result is None:
+                        out_of_time = True
+                    else:
+                        results[key] = result
+
+            if out_of_time:
+                # Queued evaluations are cancelled and running ones stop at the deadline
+                break
+
+            for state in states:
+                if state.done:
+                    continue
+                scores = []
+                for config in state.survivors:
+                    fold_results = [results[(state.name, _config_key(config), fold)] for fold in range(len(folds))]
+                    scores.append((config, {
+                        "rmse": float(np.mean([r["rmse"] for r in fold_results])),
+                        "n_estimators": int(np.median([r["best_iteration"] for r in fold_results])) + 1
+                    }))
+                state.promote(scores)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    best = {state.name: state.best for state in states if state.best is not None}
+    with open(tuned_params_path(X, y, random_state), "w") as f:
+        json.dump(best, f, indent=2)
+    return best
+
+
+def tuning_dir(X, y, random_state=42):
+    """Cache directory of the ``tune`` runs on this data."""
+    return cache_path(os.path.join("tuning", frame_fingerprint(X.assign(_target=y.values), random_state, VERSION)))
+
+
+def tuned_params_path(X, y, random_state=42):
+    """File holding the best configurations of the ``tune`` runs on this data (it may not exist)."""
+    return os.path.join(tuning_dir(X, y, random_state), "best.json")
+
+
+def load_tuned_params(X, y, random_state=42):
+    """Best parameters from a previous ``tune`` run on the same data, or None."""
+    path = tuned_params_path(X, y, random_state)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return {name: entry["params"] for name, entry in json.load(f).items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the crop yield models with successive halving.")
+    parser.add_argument("--budget", type=float, default=600, help="time budget in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument("--candidates", type=int, default=N_CANDIDATES, help="initial configurations per model")
+    args = parser.parse_args()
+
+    X, y = build_features(load_agriculture_data())
+    start = time.monotonic()
+    best = tune(X, y, budget=args.budget, workers=args.workers, n_candidates=args.candidates)
+    for name, entry in best.items():
+        print(f"{name}: RMSE {entry['rmse']:.3f} with {entry['params']} "
+              f"(budget {entry['resource']}, {entry['candidates']} candidates)")
+    print(f"Finished in {math.ceil(time.monotonic() - start)}s")
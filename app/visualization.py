@@ -1,12 +1,16 @@
 # app/visualization.py
 import plotly.express as px
+import plotly.graph_objects as go
 import altair as alt
+import numpy as np
 import pandas as pd
 
+from districts import district_id
+
 def yield_trend_line(df, district=None, prediction_data=None):
     """Line chart of yield over years with prediction highlights"""
     if district:
-        data = df[df['DISTRICT_NAME'] == district]
+        data = df[df['district_id'] == district_id(district)]
         title = f"Yield Trend for {district}"
     else:
         data = df
@@ -36,11 +40,14 @@ def yield_comparison_bar(df, year):
     fig.update_layout(xaxis_tickangle=-45)
     return fig
 
-def feature_importance_chart(importances, feature_names):
-    """Bar chart for feature importances (for tree models)."""
+def feature_importance_chart(importances, feature_names, errors=None, title='Feature Importances'):
+    """Bar chart for feature importances (for tree models), with optional error bars."""
     imp_df = pd.DataFrame({'Feature': feature_names, 'Importance': importances})
+    if errors is not None:
+        imp_df['Error'] = errors
     imp_df = imp_df.sort_values('Importance', ascending=False)
-    fig = px.bar(imp_df, x='Feature', y='Importance', title='Feature Importances')
+    fig = px.bar(imp_df, x='Feature', y='Importance', title=title,
+                 error_y='Error' if errors is not None else None)
     return fig
 
 def prediction_vs_actual(y_true, y_pred):
@@ -49,3 +56,51 @@ def prediction_vs_actual(y_true, y_pred):
     fig = px.scatter(df, x='Actual', y='Predicted', trendline='ols',
                      title='Predicted vs Actual Yield')
     return fig
+
+def forecast_band_chart(history, forecast, title, y_label):
+    """Recent history with the forecast mean and its prediction interval."""
+    fig = go.Figure()
+    fig.add_scatter(x=history['date'], y=history['value'], mode='lines', name='Observed')
+    fig.add_scatter(x=forecast['date'], y=forecast['upper'], mode='lines',
+                    line=dict(width=0), showlegend=False, hoverinfo='skip')
+    fig.add_scatter(x=forecast['date'], y=forecast['lower'], mode='lines', line=dict(width=0),
+                    fill='tonexty', fillcolor='rgba(76, 175, 80, 0.25)', name='95% interval')
+    fig.add_scatter(x=forecast['date'], y=forecast['mean'], mode='lines',
+                    line=dict(color='#2e7d32', dash='dash'), name='Forecast')
+    fig.update_layout(title=title, xaxis_title='Date', yaxis_title=y_label, hovermode='x unified')
+    return fig
+
+def anomaly_map_chart(geojson, district_ids, names, anomalies, title):
+    """Choropleth of one anomaly value per district, diverging around zero."""
+    limit = max(float(np.nanmax(np.abs(anomalies))), 1e-9) if np.isfinite(anomalies).any() else 1.0
+    fig = px.choropleth_mapbox(
+        pd.DataFrame({'id': [str(i) for i in district_ids], 'District': names, 'Anomaly': anomalies}),
+        geojson=geojson, locations='id', color='Anomaly', hover_name='District',
+        hover_data={'id': False, 'Anomaly': ':.2f'},
+        color_continuous_scale='RdBu_r', range_color=(-limit, limit),
+        mapbox_style='carto-positron', center={'lat': 28.3949, 'lon': 84.1240}, zoom=5.5,
+        opacity=0.8, title=title
+    )
+    fig.update_layout(margin={'r': 0, 't': 50, 'l': 0, 'b': 0})
+    return fig
+
+def hotspot_map_chart(geojson, district_ids, names, labels, values, value_label, colors, title):
+    """Choropleth of a categorical hotspot label per district, with the statistic on hover."""
+    fig = px.choropleth_mapbox(
+        pd.DataFrame({'id': [str(i) for i in district_ids], 'District': names,
+                      'Class': labels, value_label: values}),
+        geojson=geojson, locations='id', color='Class', hover_name='District',
+        hover_data={'id': False, value_label: ':.2f'},
+        color_discrete_map=colors, category_orders={'Class': list(colors)},
+        mapbox_style='carto-positron', center={'lat': 28.3949, 'lon': 84.1240}, zoom=5.5,
+        opacity=0.8, title=title
+    )
+    fig.update_layout(margin={'r': 0, 't': 50, 'l': 0, 'b': 0}, legend_title_text='')
+    return fig
+
+def anomaly_heatmap(dates, matrix, names, title):
+    """District x month heatmap of anomalies."""
+    fig = go.Figure(go.Heatmap(x=dates, y=names, z=matrix, colorscale='RdBu_r', zmid=0,
+                               colorbar=dict(title='σ')))
+    fig.update_layout(title=title, xaxis_title='Date', height=max(400, 14 * len(names)))
+    return fig
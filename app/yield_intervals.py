@@ -0,0 +1,117 @@
+# app/yield_intervals.py
+"""Bootstrap prediction intervals for crop yields.
+
+An ensemble of XGBoost models is fit on bootstrap resamples of the yield
+table, one member per worker process, and cached on disk. Each member also
+keeps its out-of-bag residuals. An interval is then one batched pass: the
+input is converted once, every member predicts all of its rows, and the
+(members x rows) predictions plus resampled residuals are reduced to
+quantiles with array operations. Intervals for the whole district x year grid
+cost one prediction call per member however many cells there are.
+"""
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from cache_utils import cache_path, frame_fingerprint
+from jobs import process_pool, report_progress
+from yield_models import FEATURES
+
+N_MEMBERS = 50
+RESIDUAL_DRAWS = 20
+LEVEL = 0.95
+
+_X = None
+_y = None
+_params = None
+
+
+def _init_worker(X, y, params):
+    global _X, _y, _params
+    _X, _y, _params = X, y, params
+
+
+def _fit_member(seed):
+    """Fit one member on a bootstrap resample; returns its booster and out-of-bag residuals."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(_y), len(_y))
+    out_of_bag = np.setdiff1d(np.arange(len(_y)), rows)
+    model = XGBRegressor(**{"random_state": 42, **_params, "n_jobs": 1})
+    model.fit(_X[rows], _y[rows])
+    booster = model.get_booster()
+    residuals = _y[out_of_bag] - booster.inplace_predict(_X[out_of_bag], validate_features=False)
+    return booster, residuals
+
+
+class BootstrapEnsemble:
+    """Bootstrap members and their pooled out-of-bag residuals."""
+
+    def __init__(self, boosters, residuals, columns):
+        self.boosters = boosters
+        self.residuals = residuals
+        self.columns = list(columns)
+
+    def member_predictions(self, X):
+        """(n_members, n_rows) predictions of every member for the encoded inputs ``X``."""
+        X = np.ascontiguousarray(X.reindex(columns=self.columns, fill_value=0), dtype=np.float32)
+        return np.stack([booster.inplace_predict(X, validate_features=False) for booster in self.boosters])
+
+    def predict_interval(self, X, level=LEVEL, draws=RESIDUAL_DRAWS, seed=0):
+        """Bagged mean and the ``level`` prediction interval for each row of ``X``.
+
+        Each member's prediction is combined with ``draws`` resampled
+        out-of-bag residuals, so the interval covers both model and noise
+        uncertainty. Returns three arrays: mean, lower, upper.
+        """
+        predictions = self.member_predictions(X)
+        noise = np.random.default_rng(seed).choice(self.residuals, size=(len(self.boosters), draws))
+        samples = (predictions[:, None, :] + noise[:, :, None]).reshape(-1, predictions.shape[1])
+        lower, upper = np.quantile(samples, [(1 - level) / 2, (1 + level) / 2], axis=0)
+        return predictions.mean(axis=0), lower, upper
+
+
+def train_ensemble(X, y, params=None, n_members=N_MEMBERS, workers=None):
+    """Fit (or load from the cache) a bootstrap ensemble for the encoded inputs ``X``."""
+    params = params or {}
+    path = cache_path(f"bootstrap-{frame_fingerprint(X.assign(_target=y.values), params, n_members)}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path)
+
+    X_values, y_values = X.to_numpy(np.float32, copy=True), y.to_numpy(np.float64, copy=True)
+    boosters, residuals = [], []
+    report_progress(0.0, f"Fitting {n_members} bootstrap models")
+    executor = process_pool(max_workers=workers, initializer=_init_worker,
+                            initargs=(X_values, y_values, params))
+    try:
+        for booster, member_residuals in executor.map(_fit_member, range(n_members)):
+            boosters.append(booster)
+            residuals.append(member_residuals)
+            report_progress(len(boosters) / n_members, f"Fitted {len(boosters)} of {n_members} bootstrap models")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    ensemble = BootstrapEnsemble(boosters, np.concatenate(residuals), X.columns)
+    joblib.dump(ensemble, path)
+    return ensemble
+
+
+def interval_grid(df, ensemble, years, level=LEVEL):
+    """Prediction intervals for every district and year in ``years``, in one batched pass.
+
+    Each district keeps the cultivated area of its latest recorded year, as in
+    ``forecast_yields``. Returns a DataFrame with district_id, DISTRICT_NAME,
+    VG_A, year, mean, lower and upper, sorted by district ID and year.
+    """
+    latest = df.dropna(subset=['VG_A']).sort_values('year').groupby('district_id').tail(1)
+    grid = latest[['district_id', 'DISTRICT_NAME', 'VG_A']].merge(pd.DataFrame({'year': np.asarray(years)}), how='cross')
+    mean, lower, upper = ensemble.predict_interval(pd.get_dummies(grid[FEATURES]), level)
+    return grid.assign(mean=mean, lower=lower, upper=upper).sort_values(['district_id', 'year'], ignore_index=True)
+
+
+def build_intervals(df, X, y, years, params=None):
+    """Train (or load) the ensemble and compute the district x year interval grid."""
+    ensemble = train_ensemble(X, y, params)
+    return ensemble, interval_grid(df, ensemble, years)
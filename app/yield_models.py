@@ -0,0 +1,84 @@
+# app/yield_models.py
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import RandomForestRegressor
+from xgboost import XGBRegressor
+from sklearn.metrics import r2_score, mean_squared_error
+from sklearn.model_selection import train_test_split
+
+from districts import with_district_ids
+from jobs import report_progress
+from shared_data import shared_frame
+
+AGRICULTURE_PATH = "data/processed_agriculture_data.csv"
+FEATURES = ['DISTRICT_NAME', 'year', 'VG_A']
+TARGET = 'VG_Y'
+
+
+def load_agriculture_data(path=AGRICULTURE_PATH):
+    """Long district-year table of vegetable production (VG_P), area (VG_A) and yield (VG_Y)."""
+    df = with_district_ids(pd.read_csv(path), 'DISTRICT_NAME')
+    melted = df.melt(id_vars=['DISTRICT_NAME', 'district_id'], var_name='metric_year', value_name='value')
+    melted[['metric', 'year']] = melted['metric_year'].str.rsplit('_', n=1, expand=True)
+    melted['year'] = melted['year'].str[:4]
+    melted['year'] = pd.to_numeric(melted['year'], errors='coerce').astype('Int64')
+    # Identifier columns (DNM, DCD, DISTRICT_CODE) are melted too; only the metrics are numeric
+    melted['value'] = pd.to_numeric(melted['value'], errors='coerce')
+    return melted.pivot_table(index=['DISTRICT_NAME', 'district_id', 'year'], columns='metric',
+                              values='value').reset_index()
+
+
+def load_agriculture(path=AGRICULTURE_PATH):
+    """Agriculture table as a shared read-only view; see shared_data."""
+    return shared_frame("agriculture", [path], lambda: load_agriculture_data(path), version=2)
+
+
+def build_features(df):
+    """One-hot encoded model inputs and the matching yield target."""
+    features = df[FEATURES].dropna()
+    target = df.loc[features.index, TARGET]
+    return pd.get_dummies(features), target
+
+
+def make_models(params=None):
+    """Fresh, unfitted estimators; ``params`` maps model name to overrides of the defaults."""
+    params = params or {}
+    return {
+        "Linear Regression": LinearRegression(**params.get("Linear Regression", {})),
+        "Random Forest": RandomForestRegressor(
+            **{"n_estimators": 100, "random_state": 42, **params.get("Random Forest", {})}
+        ),
+        "XGBoost": XGBRegressor(**{"random_state": 42, **params.get("XGBoost", {})})
+    }
+
+
+def train_models(X, y, params=None):
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    models = make_models(params)
+
+    results = {}
+    for i, (name, model) in enumerate(models.items()):
+        report_progress(i / len(models), f"Training {name}", partial=(dict(results), X_test, y_test))
+        model.fit(X_train, y_train)
+        preds = model.predict(X_test)
+        rmse = mean_squared_error(y_test, preds) ** 0.5
+        r2 = r2_score(y_test, preds)
+        results[name] = {"model": model, "rmse": rmse, "r2": r2}
+    return results, X_test, y_test
+
+
+def forecast_yields(df, results, training_columns, years):
+    """Yield predicted by every model for each district and year in ``years``.
+
+    Each district keeps the cultivated area of its latest recorded year.
+    Returns a long DataFrame with district_id, DISTRICT_NAME, year, VG_A,
+    model and predicted VG_Y.
+    """
+    latest = df.dropna(subset=['VG_A']).sort_values('year').groupby('district_id').tail(1)
+    grid = latest[['district_id', 'DISTRICT_NAME', 'VG_A']].merge(pd.DataFrame({'year': np.asarray(years)}), how='cross')
+    X = pd.get_dummies(grid[FEATURES]).reindex(columns=training_columns, fill_value=0)
+    return pd.concat(
+        [grid.assign(model=name, VG_Y=result['model'].predict(X)) for name, result in results.items()],
+        ignore_index=True
+    )
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from districts import DISTRICTS, district_id, district_ids, district_names, per_district, with_district_ids
+
+
+def test_aliases_and_spellings_resolve_to_canonical_ids():
+    ids = district_ids(["Chitawan", "CHITWAN", "chitwan", "Kabhre", "Kavre", "Nawalparasi West", None])
+    expected = ["Chitwan"] * 3 + ["Kavrepalanchok"] * 2 + ["Nawalparasi"]
+    assert ids.tolist() == [DISTRICTS.index(name) for name in expected] + [-1]
+    assert DISTRICTS[district_id("Tanahu")] == "Tanahun"
+
+
+def test_unknown_names_raise_or_coerce():
+    with pytest.raises(KeyError, match="Atlantis"):
+        district_ids(["Kaski", "Atlantis"])
+    assert district_ids(["Kaski", "Atlantis"], errors="coerce").tolist() == [district_id("Kaski"), -1]
+
+
+def test_names_and_per_district_arrays_round_trip():
+    df = with_district_ids(pd.DataFrame({"district": ["Kaski", "Jumla", "Kaski", "Atlantis"],
+                                         "rain": [1.0, 2.0, 3.0, 4.0]}), "district", errors="coerce")
+    assert df["district"].tolist() == ["Kaski", "Jumla", "Kaski", None]
+    assert district_names([-1, 0]).tolist() == [None, DISTRICTS[0]]
+    totals = per_district(df["district_id"], df["rain"])
+    means = per_district(df["district_id"], df["rain"], how="mean")
+    assert totals.shape == (len(DISTRICTS),) and totals.sum() == 6.0
+    assert totals[district_id("Kaski")] == 4.0 and means[district_id("Kaski")] == 2.0
+    assert np.isnan(means[district_id("Humla")])
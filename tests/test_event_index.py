@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from districts import N_DISTRICTS
+from event_index import EventIndex
+
+TYPES = ["Flood", "Earthquake", "Wildfire", "Epidemic", "Drought"]
+
+
+def _events(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "year": rng.integers(1990, 2021, n),
+        "disaster_type": rng.choice(TYPES, n),
+        "district_id": rng.integers(-1, N_DISTRICTS, n).astype(np.int16),
+        "deaths": rng.integers(0, 50, n),
+    })
+
+
+def test_queries_match_brute_force_filtering():
+    index = EventIndex(_events())
+    events = index.events
+    assert np.all(np.diff(events["year"]) >= 0)
+    rng = random.Random(0)
+    for _ in range(200):
+        start = rng.randint(index.year_min - 2, index.year_max + 2)
+        end = rng.randint(start, index.year_max + 2)
+        types = rng.sample(TYPES + ["Tsunami"], rng.randint(0, 3))
+        mask = events["year"].between(start, end)
+        if types:
+            mask &= events["disaster_type"].isin(types)
+        view = index.query((start, end), types)
+        pd.testing.assert_frame_equal(view.frame, events[mask])
+        assert len(view) == mask.sum()
+        assert view.type_counts.sum() == mask.sum()
+        assert view.district_counts.sum() == (mask & (events["district_id"] >= 0)).sum()
+
+
+def test_unsorted_input_is_sorted_stably():
+    events = pd.DataFrame({"year": [2005, 2001, 2005, 2001],
+                           "disaster_type": ["Flood", "Wildfire", "Drought", "Flood"],
+                           "district_id": np.array([0, 1, 2, 3], dtype=np.int16)})
+    index = EventIndex(events)
+    # Types are listed in order of first appearance in the year-sorted catalogue
+    assert index.types == ["Wildfire", "Flood", "Drought"]
+    assert index.events["district_id"].tolist() == [1, 3, 0, 2]
+    assert index.query((2001, 2001), ["Flood"]).column("district_id").tolist() == [3]
+    assert index.query((2002, 2004)).empty
+    assert index.query().type_counts.to_dict() == {"Wildfire": 1, "Flood": 2, "Drought": 1}
+    assert index.query(disaster_types=["Drought"]).district_counts[2] == 1
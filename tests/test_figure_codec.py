@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from shapely.geometry import Polygon, shape
+
+from figure_codec import figure_to_compact_json, round_figure
+
+# A narrow district-sized polygon near 84°E / 28°N, where 3 significant
+# digits would be a 0.1° grid
+POLYGON = Polygon([(84.12345, 28.01234), (84.19871, 28.01602), (84.20113, 28.05877),
+                   (84.16542, 28.04911), (84.12345, 28.01234)])
+
+
+def _map_figure():
+    geojson = {"type": "FeatureCollection",
+               "features": [{"type": "Feature", "id": "0", "properties": {},
+                             "geometry": POLYGON.__geo_interface__}]}
+    fig = go.Figure(go.Choroplethmapbox(geojson=geojson, locations=["0"], z=[1.2345678]))
+    fig.add_trace(go.Scattermapbox(lat=[28.0123456], lon=[84.1234567]))
+    return fig
+
+
+def _polygon(figure):
+    return shape(figure["data"][0]["geojson"]["features"][0]["geometry"])
+
+
+def test_round_figure_keeps_polygons_valid_at_low_precision():
+    rounded = round_figure(_map_figure(), precision=3)
+    polygon = _polygon(rounded)
+    assert polygon.is_valid
+    assert abs(polygon.area - POLYGON.area) / POLYGON.area < 1e-3
+    assert rounded["data"][0]["z"][0] == 1.23
+
+
+def test_coordinates_use_fixed_decimals():
+    rounded = round_figure(_map_figure(), precision=3, coordinate_decimals=5)
+    assert rounded["data"][1]["lat"][0] == 28.01235
+    assert rounded["data"][1]["lon"][0] == 84.12346
+
+
+def test_compact_json_keeps_polygons_valid():
+    encoded = json.loads(figure_to_compact_json(_map_figure(), precision=3))
+    polygon = _polygon(encoded)
+    assert polygon.is_valid
+    assert np.allclose(polygon.exterior.coords, POLYGON.exterior.coords, atol=1e-5)
+
+
+def _animated_figure():
+    frame = pd.DataFrame({"year": [2000, 2000, 2001, 2002], "lat": [28.0123456, 27.5, 28.25, 29.0],
+                          "lon": [84.1234567, 85.5, 83.25, 82.0], "size": [1.2345678, 2.0, 3.0, 4.0]})
+    return px.scatter_mapbox(frame, lat="lat", lon="lon", size="size", animation_frame="year")
+
+
+def test_round_figure_keeps_animation_frames():
+    fig = _animated_figure()
+    rounded = round_figure(fig, precision=3)
+    assert [frame["name"] for frame in rounded["frames"]] == ["2000", "2001", "2002"]
+    assert rounded["frames"][0]["data"][0]["lat"][0] == 28.01235
+    assert rounded["frames"][0]["data"][0]["marker"]["size"][0] == 1.23
+    assert rounded["layout"]["sliders"][0]["steps"][2]["args"][0] == ["2002"]
+    assert len(go.Figure(rounded).frames) == len(fig.frames)
+
+
+def test_compact_json_keeps_animation_frames():
+    encoded = json.loads(figure_to_compact_json(_animated_figure()))
+    assert [frame["name"] for frame in encoded["frames"]] == ["2000", "2001", "2002"]
+    assert encoded["frames"][2]["data"][0]["lat"]["dtype"] == "f8"
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from districts import N_DISTRICTS
+from hotspots import HOTSPOT_CLASSES, ContiguityWeights, classify_hotspots, local_statistics
+
+
+def _path_weights(n, islands=0):
+    """Districts 0..n-1 in a row, each touching the next, plus ``islands`` districts without neighbours."""
+    rows = np.arange(n - 1)
+    matrix = sp.coo_matrix((np.ones(2 * (n - 1)), (np.r_[rows, rows + 1], np.r_[rows + 1, rows])),
+                           shape=(n + islands, n + islands))
+    return ContiguityWeights(np.arange(n + islands), matrix)
+
+
+def _counts(values):
+    counts = np.zeros(N_DISTRICTS)
+    counts[:len(values)] = values
+    return counts
+
+
+def test_gi_star_and_local_moran_on_a_hand_computed_lattice():
+    # x = 1, 2, 3, 10 on the path 0-1-2-3: mean 4, s = sqrt(12.5), m2 = 12.5
+    stats = local_statistics(_counts([1, 2, 3, 10]), _path_weights(4), permutations=99)
+    s = np.sqrt(12.5)
+    # (x_i + lag_i - mean * w*) / (s * sqrt((n w* - w*^2) / (n - 1))), w* = k + 1
+    expected_gi = [(1 + 2 - 8) / (s * np.sqrt(4 / 3)), (2 + 4 - 12) / s, (3 + 12 - 12) / s,
+                   (10 + 3 - 8) / (s * np.sqrt(4 / 3))]
+    np.testing.assert_allclose(stats["gi_star"][:4], expected_gi)
+    # z_i / m2 * (mean neighbour value - mean)
+    expected_i = [-3 / 12.5 * (2 - 4), -2 / 12.5 * (2 - 4), -1 / 12.5 * (6 - 4), 6 / 12.5 * (3 - 4)]
+    np.testing.assert_allclose(stats["local_i"][:4], expected_i)
+    assert np.isnan(stats["gi_star"][4:]).all()
+    assert ((stats["gi_p"][:4] > 0) & (stats["gi_p"][:4] <= 1)).all()
+
+
+def test_permutation_p_values_do_not_depend_on_the_number_of_threads():
+    weights = _path_weights(12)
+    counts = _counts(np.random.default_rng(1).integers(0, 20, 12))
+    one = local_statistics(counts, weights, permutations=499, seed=3, workers=1)
+    four = local_statistics(counts, weights, permutations=499, seed=3, workers=4)
+    np.testing.assert_array_equal(one["gi_p"], four["gi_p"])
+    np.testing.assert_array_equal(one["local_i_p"], four["local_i_p"])
+
+
+def test_a_clear_cluster_is_a_hot_spot():
+    weights = _path_weights(20)
+    values = np.ones(20)
+    values[8:12] = 50
+    labels = classify_hotspots(local_statistics(_counts(values), weights, permutations=999))
+    assert set(labels[9:11]) == {HOTSPOT_CLASSES[0]}
+    assert set(labels[:3]) == {HOTSPOT_CLASSES[2]}
+
+
+@pytest.mark.parametrize("value", [0, 7])
+def test_constant_counts_have_no_hotspots(value):
+    weights = _path_weights(6, islands=1)
+    stats = local_statistics(_counts([value] * 7), weights, permutations=99)
+    np.testing.assert_array_equal(stats["gi_p"][:6], 1.0)
+    np.testing.assert_array_equal(stats["local_i_p"][:6], 1.0)
+    assert np.isnan(stats["gi_star"][:6]).all() and np.isnan(stats["local_i"][:6]).all()
+    assert np.isnan(stats["gi_p"][6])  # the island has no neighbours
+    assert set(classify_hotspots(stats)) == {HOTSPOT_CLASSES[2]}
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from jobs import JobQueueFull, JobScheduler
+
+
+def test_try_submit_returns_busy_placeholder_when_queue_is_full():
+    scheduler = JobScheduler(max_workers=1, max_pending=1)
+    release = threading.Event()
+    running = scheduler.submit("slow", release.wait)
+    try:
+        busy = scheduler.try_submit("other", lambda: 1)
+        assert busy.status == 'busy' and not busy.done
+        assert scheduler.get("other") is None
+        with pytest.raises(JobQueueFull):
+            scheduler.submit("other", lambda: 1)
+    finally:
+        release.set()
+    running.wait(5)
+    job = scheduler.try_submit("other", lambda: 1)
+    assert job.wait(5) and job.result == 1
+
+
+def test_failed_job_is_kept_until_forgotten():
+    scheduler = JobScheduler(max_workers=1)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("boom")
+        return len(calls)
+
+    failed = scheduler.submit("flaky", flaky)
+    assert failed.wait(5) and failed.status == 'failed'
+    assert scheduler.submit("flaky", flaky) is failed
+    assert len(calls) == 1
+    scheduler.forget("flaky")
+    retried = scheduler.submit("flaky", flaky)
+    assert retried.wait(5) and retried.result == 2
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_utils
+from shared_data import shared_frame
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path
+
+
+def _frame():
+    return pd.DataFrame({
+        "district": ["Kaski", np.nan, "Jumla", "Kaski"],
+        "year": pd.array([2001, None, 2003, 2004], dtype="Int64"),
+        "rain": [1.5, np.nan, 3.25, 4.0],
+        "date": pd.to_datetime(["2001-01-01", "2002-06-30", "2003-12-31", "2004-02-29"]),
+        "flag": [True, False, True, False],
+        "code": np.array([1, 2, 3, 4], dtype=np.int16),
+    })
+
+
+def _source(directory, text):
+    path = directory / "source.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def test_round_trip_is_memory_mapped_and_read_only(cache_dir):
+    source = _source(cache_dir, "v1")
+    shared = shared_frame("round_trip", [source], _frame)
+    # Boolean columns keep the np.memmap class, which assert_frame_equal treats as a difference
+    pd.testing.assert_frame_equal(shared.drop(columns="flag"), _frame().drop(columns="flag"))
+    assert shared["flag"].tolist() == _frame()["flag"].tolist()
+    assert isinstance(shared["rain"].to_numpy().base, np.memmap)
+    for column in ("district", "rain", "code"):
+        with pytest.raises(ValueError, match="read-only"):
+            shared.loc[0, column] = shared.loc[2, column]
+    # Replacing a column only changes the caller's view
+    shared["rain"] = 0.0
+    assert shared_frame("round_trip", [source], _frame)["rain"].iloc[0] == 1.5
+
+
+def test_built_once_and_rebuilt_when_a_source_changes(cache_dir):
+    builds = []
+
+    def build():
+        builds.append(1)
+        return _frame().assign(version=len(builds))
+
+    source = _source(cache_dir, "v1")
+    assert shared_frame("rebuild", [source], build)["version"].iloc[0] == 1
+    assert shared_frame("rebuild", [source], build)["version"].iloc[0] == 1
+    assert len(builds) == 1
+    _source(cache_dir, "version 2")
+    assert shared_frame("rebuild", [source], build)["version"].iloc[0] == 2
+    assert shared_frame("rebuild", [source], build, version=2)["version"].iloc[0] == 3
+    assert len(os.listdir(os.path.join(cache_utils.CACHE_DIR, "shared"))) == 3
+
+
+def test_in_memory_datasets_are_copied_per_caller(cache_dir):
+    source = _source(cache_dir, "v1")
+    first = shared_frame("in_memory", [source], _frame, persist=False)
+    first.loc[0, "rain"] = -1.0
+    assert shared_frame("in_memory", [source], _frame, persist=False).loc[0, "rain"] == 1.5